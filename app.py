@@ -1,6 +1,5 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
 import os
 import logging
 from dotenv import load_dotenv
@@ -14,6 +13,26 @@ from routes.products import products_bp
 from routes.reviews import reviews_bp
 from routes.salts import salts_bp
 from routes.config import config_bp
+from routes.health import health_bp
+from routes.metrics import metrics_bp
+from services.cache import init_cache
+from services.changes import init_catalog_watcher, init_changes
+from services.compression import init_compression
+from services.config_store import init_config_store
+from services.database import init_database
+from services.detail_reads import init_detail_reads
+from services.facets import init_facets
+from services.importer import init_importer
+from services.json_provider import init_json
+from services.metrics import init_metrics
+from services.migrations import init_migrations
+from services.passwords import init_passwords
+from services.ratelimit import init_rate_limits
+from services.ratings import init_ratings
+from services.search import init_search
+from services.snapshot import init_snapshot, warm_start
+from services.substitutes import init_substitutes
+from services.tokens import init_tokens
 
 def create_app(config_name=None):
     app = Flask(__name__)
@@ -26,8 +45,26 @@ def create_app(config_name=None):
     logging.basicConfig(level=logging.INFO)
     
     # Initialize extensions
+    init_database(app)
     db.init_app(app)
-    jwt = JWTManager(app)
+    init_metrics(app)
+    init_json(app)
+    init_compression(app)
+    init_changes(db.session)
+    init_passwords(app)
+    init_search(app)
+    init_facets(app)
+    init_substitutes(app)
+    init_catalog_watcher(app)
+    init_cache(app)
+    init_rate_limits(app)
+    init_detail_reads(app)
+    init_ratings(app)
+    init_migrations(app)
+    init_importer(app)
+    init_snapshot(app)
+    config_store = init_config_store(app)
+    jwt = init_tokens(app)
     CORS(app, origins=['http://localhost:3000', 'http://127.0.0.1:3000', 'http://localhost:3001', 'http://127.0.0.1:3001'])
     
     # JWT error handlers
@@ -43,6 +80,10 @@ def create_app(config_name=None):
     def missing_token_callback(error):
         return jsonify({'error': 'Authorization token is required'}), 401
     
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token has been revoked'}), 401
+    
     # Basic home route
     @app.route('/')
     def home():
@@ -52,10 +93,14 @@ def create_app(config_name=None):
             'endpoints': {
                 'login': '/api/login',
                 'register': '/api/register',
+                'refresh': '/api/refresh',
+                'logout': '/api/logout',
                 'products': '/api/products',
                 'reviews': '/api/reviews',
                 'salts': '/api/salts',
-                'config': '/api/config'
+                'config': '/api/config',
+                'health': '/api/health',
+                'metrics': '/api/metrics'
             }
         })
     
@@ -65,10 +110,16 @@ def create_app(config_name=None):
     app.register_blueprint(reviews_bp, url_prefix='/api/reviews')
     app.register_blueprint(salts_bp, url_prefix='/api/salts')
     app.register_blueprint(config_bp, url_prefix='/api/config')
+    app.register_blueprint(health_bp, url_prefix='/api/health')
+    app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
     
-    # Create database tables if they don't exist
+    # Create database tables if they don't exist (SCHEMA_CHECK=false skips this after deploys
+    # that ran migrations), then load in-memory state from the warm-start snapshot if configured
     with app.app_context():
-        db.create_all()
+        if app.config['SCHEMA_CHECK']:
+            db.create_all()
+        if not warm_start(app):
+            config_store.reload()
     
     return app
 
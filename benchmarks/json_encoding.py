@@ -0,0 +1,115 @@
+"""
+Encoding throughput of product listing pages: ORM objects + stdlib JSON vs row tuples + orjson.
+
+Seeds a synthetic catalog into a temporary SQLite file (or ``--database-url``)
+and, for each page size, repeatedly loads and encodes one listing page:
+
+    python -m benchmarks.json_encoding --page-sizes 20,100,1000
+
+Paths compared:
+  orm+stdlib   Product objects, ``to_dict`` and Flask's default provider (the original path)
+  rows+stdlib  ``select_fields`` row tuples with the stdlib provider
+  rows+orjson  ``select_fields`` row tuples with the orjson provider (skipped if orjson is missing)
+
+Reports bytes/s and milliseconds per page, including the query.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _paths(app):
+    from flask.json.provider import DefaultJSONProvider
+
+    from models import Product
+    from services.json_provider import OrjsonJSONProvider, StdlibJSONProvider, orjson
+    from services.serializers import select_fields, serialize_products
+
+    default, stdlib = DefaultJSONProvider(app), StdlibJSONProvider(app)
+
+    def orm_stdlib(size):
+        products = Product.query.order_by(Product.created_at.desc()).limit(size).all()
+        return default.dumps({'products': serialize_products(products)}).encode()
+
+    def rows_stdlib(size):
+        rows = select_fields(Product.query, None).order_by(Product.created_at.desc()).limit(size).all()
+        return stdlib.dumps({'products': serialize_products(rows)}).encode()
+
+    paths = {'orm+stdlib': orm_stdlib, 'rows+stdlib': rows_stdlib}
+    if orjson is not None:
+        fast = OrjsonJSONProvider(app)
+
+        def rows_orjson(size):
+            rows = select_fields(Product.query, None).order_by(Product.created_at.desc()).limit(size).all()
+            return fast.dumps_bytes({'products': serialize_products(rows)})
+
+        paths['rows+orjson'] = rows_orjson
+    return paths
+
+
+def measure(app, path, size, seconds):
+    from models import db
+
+    iterations, total_bytes = 0, 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        total_bytes += len(path(size))
+        db.session.remove()  # each page is a fresh request
+        iterations += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'pages': iterations,
+        'bytes_per_page': total_bytes // iterations,
+        'ms_per_page': round(elapsed / iterations * 1000, 3),
+        'bytes_per_second': round(total_bytes / elapsed)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='Database to seed (default: temporary SQLite file)')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--page-sizes', default='20,100,1000')
+    parser.add_argument('--seconds', type=float, default=2.0, help='Time spent on each path and page size')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args(argv)
+
+    directory = tempfile.TemporaryDirectory()
+    os.environ['TEST_DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(directory.name, 'bench.db')}"
+
+    from app import create_app
+    from benchmarks.api import seed
+
+    app = create_app('testing')
+    seed(app, SimpleNamespace(
+        products=args.products, salts_per_product=2, reviews_per_product=3, users=0, seed=1
+    ))
+
+    results = {}
+    with app.app_context():
+        paths = _paths(app)
+        for size in (int(value) for value in args.page_sizes.split(',')):
+            results[size] = {name: measure(app, path, size, args.seconds) for name, path in paths.items()}
+
+    directory.cleanup()
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for size, by_path in results.items():
+        baseline = by_path['orm+stdlib']['bytes_per_second']
+        print(f'{size} products per page')
+        for name, result in by_path.items():
+            print(
+                f"    {name:<12} {result['bytes_per_second'] / 1e6:>8.1f} MB/s  "
+                f"{result['ms_per_page']:>9.3f} ms/page  x{result['bytes_per_second'] / baseline:.2f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
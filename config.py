@@ -15,8 +15,67 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or get_mysql_uri()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool (ignored for in-memory SQLite)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # keep below MySQL wait_timeout
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # Optional read replica used for GET requests
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    # Primary/foreign key storage: string (VARCHAR(36)) or binary (16 bytes); see `flask schema convert-ids`
+    ID_STORAGE = os.environ.get('ID_STORAGE', 'string')
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-string'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 600)))  # 10 minutes for access token
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(seconds=int(os.environ.get('JWT_REFRESH_TOKEN_EXPIRES', 30 * 24 * 3600)))  # 30 days, rotated on use
+    JWT_VERIFIED_CACHE_SIZE = int(os.environ.get('JWT_VERIFIED_CACHE_SIZE', 4096))  # verified tokens kept in memory, 0 disables
+    TOKEN_REVOCATION_REFRESH_INTERVAL = int(os.environ.get('TOKEN_REVOCATION_REFRESH_INTERVAL', 10))  # seconds between revocation syncs
+    ADMIN_USER_IDS = frozenset(filter(None, os.environ.get('ADMIN_USER_IDS', '').split(',')))  # user_ids whose tokens carry the admin claim
+    # Password hashing (werkzeug method string, e.g. pbkdf2:sha256:600000 or scrypt:32768:8:1)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 16))  # waiting hashes before 503
+    PASSWORD_HASH_TIMEOUT = int(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))  # seconds
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'memory')  # memory, like
+    SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 1000))
+    CATALOG_REFRESH_INTERVAL = int(os.environ.get('CATALOG_REFRESH_INTERVAL', 30))  # seconds between catalog change checks
+    # Upper bounds of the price facet buckets; the last bucket is open-ended
+    FACET_PRICE_BUCKETS = tuple(
+        int(bound) for bound in os.environ.get('FACET_PRICE_BUCKETS', '50,100,200,500,1000').split(',')
+    )
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')  # memory, redis, none
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))  # seconds
+    CACHE_MAX_AGE = int(os.environ.get('CACHE_MAX_AGE', 0))  # Cache-Control max-age for clients
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CONFIG_REFRESH_INTERVAL = int(os.environ.get('CONFIG_REFRESH_INTERVAL', 30))  # seconds between change checks
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')  # auto (orjson if installed), orjson, stdlib
+    # Response compression (zstd and br need the zstandard / brotli packages)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # bytes
+    COMPRESSION_ALGORITHMS = tuple(os.environ.get('COMPRESSION_ALGORITHMS', 'zstd,br,gzip').split(','))  # server preference
+    # Product detail reads: sequential (ORM), threads (sync driver, concurrent), async (asyncio driver)
+    DETAIL_LOADER = os.environ.get('DETAIL_LOADER', 'sequential')
+    DETAIL_LOADER_WORKERS = int(os.environ.get('DETAIL_LOADER_WORKERS', 8))  # threads mode
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')  # default: DATABASE_URL with an asyncio driver
+    # Token-bucket rate limits per JWT identity or client address, as N/second|minute|hour (0 disables)
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # memory (per process), none
+    RATE_LIMIT_MAX_CLIENTS = int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', 10000))  # buckets kept per process
+    SEARCH_RATE_LIMIT = os.environ.get('SEARCH_RATE_LIMIT', '120/minute')  # product listings with search
+    LARGE_PAGE_RATE_LIMIT = os.environ.get('LARGE_PAGE_RATE_LIMIT', '30/minute')  # listings with a large per_page
+    LARGE_PAGE_SIZE = int(os.environ.get('LARGE_PAGE_SIZE', 200))  # per_page from which LARGE_PAGE_RATE_LIMIT applies
+    LOGIN_RATE_LIMIT = os.environ.get('LOGIN_RATE_LIMIT', '10/minute')
+    # Concurrent identical cache misses share one view run
+    COALESCE_REQUESTS = os.environ.get('COALESCE_REQUESTS', 'true').lower() == 'true'
+    COALESCE_TIMEOUT = int(os.environ.get('COALESCE_TIMEOUT', 10))  # seconds a waiter waits before running the view itself
+    # Startup
+    SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK', 'true').lower() == 'true'  # run create_all at startup
+    WARM_START_SNAPSHOT = os.environ.get('WARM_START_SNAPSHOT')  # file from `flask snapshot build`
+    WARM_START_MAX_AGE = int(os.environ.get('WARM_START_MAX_AGE', 86400))  # seconds; older snapshots are ignored
+    # Request instrumentation
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'true').lower() == 'true'
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))  # 0 disables the slow-query log
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))  # same statement this often in one request
 
 class DevelopmentConfig(Config):
     DEBUG = True
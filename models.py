@@ -1,16 +1,29 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-import uuid
+from functools import lru_cache
+import json
+from services.database import RoutingSession
+from services.ids import UUIDKey, uuid7
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def generate_uuid():
-    return str(uuid.uuid4())
+    return str(uuid7())
+
+@lru_cache(maxsize=8192)
+def parse_json_text(text):
+    """Parse a stored JSON text column, memoized on the exact text.
+
+    A row's text only changes when the row is updated, so the cache key doubles
+    as the row version. Results are shared between callers and must not be
+    mutated.
+    """
+    return json.loads(text)
 
 class User(db.Model):
     __tablename__ = 'users'
     
-    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    id = db.Column(UUIDKey, primary_key=True, default=generate_uuid)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
     user_id = db.Column(db.String(20), unique=True, nullable=False)
@@ -27,7 +40,7 @@ class User(db.Model):
 class Product(db.Model):
     __tablename__ = 'products'
     
-    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    id = db.Column(UUIDKey, primary_key=True, default=generate_uuid)
     name = db.Column(db.String(150), nullable=False)
     brand = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Float, nullable=False)
@@ -36,6 +49,9 @@ class Product(db.Model):
     image_url = db.Column(db.Text)
     generic_name = db.Column(db.String(100))
     category = db.Column(db.String(100))
+    # Lowercased copies of brand/category so equality filters can use an index
+    brand_normalized = db.Column(db.String(100))
+    category_normalized = db.Column(db.String(100))
     # Additional fields for complete product information
     description = db.Column(db.Text)
     dosage = db.Column(db.String(100))
@@ -46,33 +62,49 @@ class Product(db.Model):
     how_it_works = db.Column(db.Text)
     faq_content = db.Column(db.Text)  # JSON string of FAQ data
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_products_created_at_id', 'created_at', 'id'),
+        db.Index('ix_products_updated_at', 'updated_at'),
+        db.Index('ix_products_price', 'price'),
+        db.Index('ix_products_brand_normalized_price', 'brand_normalized', 'price'),
+        db.Index('ix_products_category_normalized_price', 'category_normalized', 'price'),
+        db.Index('ix_products_avg_rating', 'avg_rating'),
+        db.Index('ix_products_name', 'name'),
+        db.Index('ix_products_brand_normalized_avg_rating', 'brand_normalized', 'avg_rating'),
+        db.Index('ix_products_category_normalized_avg_rating', 'category_normalized', 'avg_rating'),
+    )
     
     # Relationships
     salts = db.relationship('Salt', backref='product', lazy=True, cascade='all, delete-orphan')
     reviews = db.relationship('Review', backref='product', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self, include_relations=False):
-        import json
-        result = {
-            'id': self.id,
-            'name': self.name,
-            'brand': self.brand,
-            'price': self.price,
-            'avg_rating': self.avg_rating,
-            'chemical_form': self.chemical_form,
-            'image_url': self.image_url,
-            'generic_name': self.generic_name,
-            'category': self.category,
-            'description': self.description,
-            'dosage': self.dosage,
-            'pack_size': self.pack_size,
-            'prescription_required': self.prescription_required,
-            'uses': json.loads(self.uses) if self.uses else [],
-            'side_effects': json.loads(self.side_effects) if self.side_effects else [],
-            'how_it_works': self.how_it_works,
-            'faq_content': json.loads(self.faq_content) if self.faq_content else [],
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    # Internal columns left out of API responses
+    INTERNAL_FIELDS = ('brand_normalized', 'category_normalized')
+    # Columns holding JSON text, parsed on serialization
+    JSON_FIELDS = ('uses', 'side_effects', 'faq_content')
+    # Long text columns that listing views can leave out
+    HEAVY_FIELDS = ('description', 'uses', 'side_effects', 'how_it_works', 'faq_content')
+    
+    @staticmethod
+    def normalize(value):
+        return value.strip().lower() if value else None
+    
+    @db.validates('brand', 'category')
+    def _set_normalized(self, key, value):
+        setattr(self, f'{key}_normalized', self.normalize(value))
+        return value
+    
+    def to_dict(self, include_relations=False, fields=None):
+        result = {}
+        for field in fields or self.PUBLIC_FIELDS:
+            value = getattr(self, field)
+            if field in self.JSON_FIELDS:
+                value = parse_json_text(value) if value else []
+            elif field in ('created_at', 'updated_at'):
+                value = value.isoformat() if value else None
+            result[field] = value
         
         if include_relations:
             result['salts'] = [salt.to_dict() for salt in self.salts]
@@ -80,14 +112,26 @@ class Product(db.Model):
         
         return result
 
+# Serialized columns, in declaration order
+Product.PUBLIC_FIELDS = tuple(
+    key for key in Product.__table__.columns.keys() if key not in Product.INTERNAL_FIELDS
+)
+
 class Salt(db.Model):
     __tablename__ = 'salts'
     
-    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
-    product_id = db.Column(db.String(36), db.ForeignKey('products.id'), nullable=False)
+    id = db.Column(UUIDKey, primary_key=True, default=generate_uuid)
+    product_id = db.Column(UUIDKey, db.ForeignKey('products.id'), nullable=False)
     salt_name = db.Column(db.String(100), nullable=False)
     strength = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_salts_product_id_created_at', 'product_id', 'created_at'),
+        db.Index('ix_salts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_salts_updated_at', 'updated_at'),
+    )
     
     def to_dict(self):
         return {
@@ -101,13 +145,21 @@ class Salt(db.Model):
 class Review(db.Model):
     __tablename__ = 'reviews'
     
-    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
-    product_id = db.Column(db.String(36), db.ForeignKey('products.id'), nullable=False)
+    id = db.Column(UUIDKey, primary_key=True, default=generate_uuid)
+    # active_history: the rating summary hooks need the previous values even when the instance was expired
+    product_id = db.column_property(
+        db.Column(UUIDKey, db.ForeignKey('products.id'), nullable=False), active_history=True
+    )
     user_name = db.Column(db.String(100), nullable=False)
-    rating = db.Column(db.Integer, nullable=False)
+    rating = db.column_property(db.Column(db.Integer, nullable=False), active_history=True)
     comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_reviews_product_id_created_at_id', 'product_id', 'created_at', 'id'),
+        db.Index('ix_reviews_created_at_id', 'created_at', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -118,12 +170,37 @@ class Review(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class ProductRatingSummary(db.Model):
+    """Per-product review aggregates, kept in step with the reviews table"""
+    __tablename__ = 'product_rating_summaries'
+    
+    product_id = db.Column(UUIDKey, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+    
+    @property
+    def average(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0.0
+    
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'total_reviews': self.rating_count,
+            'average_rating': self.average,
+            'rating_distribution': {i: getattr(self, f'rating_{i}') for i in range(1, 6)}
+        }
+
 
 class AppConfig(db.Model):
     """Store dynamic configuration for the app like trust indicators, disclaimer, etc."""
     __tablename__ = 'app_config'
     
-    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    id = db.Column(UUIDKey, primary_key=True, default=generate_uuid)
     key = db.Column(db.String(100), unique=True, nullable=False)
     value = db.Column(db.Text, nullable=False)  # JSON string for complex values
     type = db.Column(db.String(50), default='string')  # string, json, number, boolean
@@ -156,3 +233,24 @@ class AppConfig(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+class RevokedToken(db.Model):
+    """JWTs revoked before expiry: rotated refresh tokens and logged-out sessions"""
+    __tablename__ = 'revoked_tokens'
+    
+    jti = db.Column(db.String(36), primary_key=True)
+    token_type = db.Column(db.String(10), nullable=False)  # access, refresh
+    user_id = db.Column(db.String(20), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CatalogDeletion(db.Model):
+    """Tombstone for a deleted product or salt, so other processes can tell the catalog changed"""
+    __tablename__ = 'catalog_deletions'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    table_name = db.Column(db.String(20), nullable=False)  # products, salts
+    row_id = db.Column(UUIDKey, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -1,11 +1,14 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import get_jwt, jwt_required
 from models import db, User
+from services.passwords import HasherBusy, get_password_hasher
+from services.ratelimit import rate_limit
+from services.tokens import TokenReused, issue_tokens, revoke_token
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login')
 def login():
     """
     Login endpoint - checks username, password and returns JWT token with user_id
@@ -19,18 +22,30 @@ def login():
         # Find user by username
         user = User.query.filter_by(username=data['username']).first()
         
-        if not user or not check_password_hash(user.password_hash, data['password']):
+        hasher = get_password_hasher()
+        if not user or not hasher.verify(user.password_hash, data['password']):
             return jsonify({'error': 'Invalid credentials'}), 401
         
-        # Create JWT token with user_id as identity
-        access_token = create_access_token(identity=user.user_id)
-        
+        # Upgrade hashes made with older KDF parameters while we have the password
+        if hasher.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = hasher.hash(data['password'])
+                db.session.commit()
+            except HasherBusy:
+                db.session.rollback()
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception('Password rehash failed for %s', user.user_id)
+        
+        # Access token plus a refresh token, both with user_id as identity
         return jsonify({
-            'token': access_token,
+            **issue_tokens(user.user_id),
             'user_id': user.user_id,
             'username': user.username
         }), 200
         
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -69,23 +84,63 @@ def register():
         # Create new user
         new_user = User(
             username=username,
-            password_hash=generate_password_hash(password),
+            password_hash=get_password_hasher().hash(password),
             user_id=user_id
         )
         
         db.session.add(new_user)
         db.session.commit()
         
-        # Create JWT token for immediate login
-        access_token = create_access_token(identity=user_id)
-        
+        # Tokens for immediate login
         return jsonify({
             'message': 'User registered successfully',
-            'token': access_token,
+            **issue_tokens(user_id),
             'user_id': user_id,
             'username': username
         }), 201
         
+    except HasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """
+    Refresh endpoint - exchanges a refresh token for a new access/refresh token pair
+    
+    The presented refresh token is revoked, so each one can be used only once.
+    """
+    try:
+        claims = get_jwt()
+        revoke_token(claims)
+        
+        return jsonify({
+            **issue_tokens(claims['sub']),
+            'user_id': claims['sub']
+        }), 200
+        
+    except TokenReused as e:
+        return jsonify({'error': str(e)}), 401
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """
+    Logout endpoint - revokes the presented access or refresh token
+    """
+    try:
+        revoke_token(get_jwt())
+        return jsonify({'message': 'Token revoked'}), 200
+        
+    except TokenReused as e:
+        return jsonify({'error': str(e)}), 401
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -1,19 +1,46 @@
-from flask import Blueprint, request, jsonify
-from models import AppConfig
+from flask import Blueprint, jsonify, make_response, request
+from services.compression import encode_response
+from services.config_store import get_config_store
+from services.tokens import admin_required
 
 config_bp = Blueprint('config', __name__)
 
+def _conditional(snapshot, payload, cache_key=None):
+    """
+    Tag a config response with the snapshot version, honour If-None-Match and compress it.
+
+    Compressed bodies are kept on the snapshot under ``cache_key``; routes only
+    pass one for content the snapshot holds, so the cache stays bounded by it.
+    """
+    response = make_response(jsonify({**payload, 'version': snapshot.version}), 200)
+    response.set_etag(snapshot.version)
+    response = response.make_conditional(request)
+    encode_response(response, snapshot.encoded.setdefault(cache_key, {}) if cache_key else None)
+    return response
+
 @config_bp.route('/', methods=['GET'])
 def get_all_config():
     """Get all app configuration"""
     try:
-        configs = AppConfig.query.all()
-        config_dict = {}
-        for config in configs:
-            config_dict[config.key] = config.to_dict()['value']
+        snapshot = get_config_store().snapshot()
+        
+        return _conditional(snapshot, {
+            'config': dict(snapshot.values),
+            'success': True
+        }, cache_key=('all',))
+        
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False}), 500
+
+@config_bp.route('/reload', methods=['POST'])
+@admin_required
+def reload_config():
+    """Reload the in-memory configuration snapshot from the database (admin tokens only)"""
+    try:
+        snapshot = get_config_store().reload()
         
         return jsonify({
-            'config': config_dict,
+            'version': snapshot.version,
             'success': True
         }), 200
         
@@ -24,15 +51,16 @@ def get_all_config():
 def get_config(config_key):
     """Get specific configuration by key"""
     try:
-        config = AppConfig.query.filter_by(key=config_key).first()
+        snapshot = get_config_store().snapshot()
+        config = snapshot.get(config_key)
         
         if not config:
             return jsonify({'error': 'Configuration not found', 'success': False}), 404
         
-        return jsonify({
-            'config': config.to_dict(),
+        return _conditional(snapshot, {
+            'config': config,
             'success': True
-        }), 200
+        }, cache_key=('key', config_key))
         
     except Exception as e:
         return jsonify({'error': str(e), 'success': False}), 500
@@ -41,16 +69,14 @@ def get_config(config_key):
 def get_config_by_category(category):
     """Get configurations by category (prefix)"""
     try:
-        configs = AppConfig.query.filter(AppConfig.key.like(f'{category}.%')).all()
-        config_dict = {}
-        for config in configs:
-            config_dict[config.key] = config.to_dict()['value']
+        snapshot = get_config_store().snapshot()
+        config = snapshot.by_prefix(f'{category}.')
         
-        return jsonify({
-            'config': config_dict,
+        return _conditional(snapshot, {
+            'config': config,
             'category': category,
             'success': True
-        }), 200
+        }, cache_key=('category', category) if config else None)
         
     except Exception as e:
         return jsonify({'error': str(e), 'success': False}), 500
@@ -0,0 +1,29 @@
+from flask import Blueprint, jsonify
+from sqlalchemy import text
+from models import db
+from services.database import pool_stats
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/', methods=['GET'])
+def health():
+    """
+    GET /api/health - Database connectivity and connection pool metrics
+    """
+    databases = {}
+    healthy = True
+    for bind_key, engine in db.engines.items():
+        name = bind_key or 'primary'
+        try:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+            databases[name] = 'ok'
+        except Exception as e:
+            databases[name] = str(e)
+            healthy = False
+    
+    return jsonify({
+        'status': 'ok' if healthy else 'degraded',
+        'databases': databases,
+        'pools': pool_stats(db.engines)
+    }), 200 if healthy else 503
@@ -0,0 +1,25 @@
+from flask import Blueprint, Response
+from models import db
+from services.database import pool_stats, pool_wait_histograms
+from services.metrics import get_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+POOL_GAUGES = ('size', 'checked_out', 'overflow', 'utilization', 'checkouts', 'checkout_timeouts')
+
+@metrics_bp.route('/', methods=['GET'])
+def metrics():
+    """
+    GET /api/metrics - Request, query and connection pool metrics in the Prometheus text format
+    """
+    gauges = []
+    for name, stats in pool_stats(db.engines).items():
+        for key in POOL_GAUGES:
+            if stats.get(key) is not None:
+                gauges.append((f'db_pool_{key}', (('database', name),), stats[key]))
+    histograms = [
+        ('db_pool_checkout_wait_seconds', (('database', name),), histogram)
+        for name, histogram in pool_wait_histograms(db.engines).items()
+    ]
+    
+    return Response(get_metrics().render(gauges, histograms), mimetype='text/plain; version=0.0.4')
@@ -1,56 +1,129 @@
-from flask import Blueprint, request, jsonify
-from models import Product
-from sqlalchemy import or_
+from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from models import Product, Salt, Review
+from services.batch import InvalidBatch, parse_ids
+from services.cache import cached_response
+from services.detail_reads import get_detail_loader
+from services.export import EXPORT_FORMATS, EXPORT_OVERLAP, InvalidExport, export_products
+from services.facets import facet_counts, listing_ids
+from services.ids import is_storable_id
+from services.pagination import (
+    InvalidCursor, InvalidPageSize, InvalidSort, keyset_paginate, parse_per_page, parse_sort, sort_columns
+)
+from services.ratelimit import rate_limit
+from services.search import InMemorySearchEngine, get_search_engine
+from services.substitutes import get_substitute_index
+from services.serializers import (
+    InvalidSelection, RELATIONS, load_fields, parse_fields, parse_include, parse_reviews_limit,
+    select_fields, serialize_products
+)
 
 products_bp = Blueprint('products', __name__)
 
+# Listing sort orders: ``sort`` value -> (column, descending). Each is backed by
+# an index on the column and by (brand_normalized|category_normalized, column)
+# for the price and rating sorts, so filtered top-N pages avoid a filesort
+# (InnoDB secondary indexes end with the primary key, covering the id tie-break).
+SORTS = {
+    'price': (Product.price, False),
+    '-price': (Product.price, True),
+    'avg_rating': (Product.avg_rating, False),
+    '-avg_rating': (Product.avg_rating, True),
+    'name': (Product.name, False),
+    'newest': (Product.created_at, True),
+}
+
+def is_search():
+    return bool(request.args.get('search'))
+
+def is_large_page():
+    return request.args.get('per_page', 20, type=int) >= current_app.config['LARGE_PAGE_SIZE']
+
+def filter_products(query, args):
+    """Apply the brand/category/generic/price filters of a product listing"""
+    brand = args.get('brand', '')
+    category = args.get('category', '')
+    generic_name = args.get('generic_name', '')
+    exclude_id = args.get('exclude_id')
+    min_price = args.get('min_price', type=float)
+    max_price = args.get('max_price', type=float)
+    prescription_required = args.get('prescription_required', '')
+    
+    # Brand and category match exactly (case-insensitive) on indexed columns
+    if brand:
+        query = query.filter(Product.brand_normalized == Product.normalize(brand))
+    
+    if category:
+        query = query.filter(Product.category_normalized == Product.normalize(category))
+    
+    if generic_name:
+        query = query.filter(Product.generic_name.ilike(f'%{generic_name}%'))
+    
+    # A malformed ID matches no product, so there is nothing to exclude (in binary ID mode it would bind as NULL)
+    if exclude_id and is_storable_id(exclude_id):
+        query = query.filter(Product.id != exclude_id)
+    
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    
+    if prescription_required:
+        query = query.filter(Product.prescription_required == (prescription_required.lower() in ('true', '1', 'yes')))
+    
+    return query
+
 @products_bp.route('/', methods=['GET'])
+@rate_limit('search', when=is_search)
+@rate_limit('large_page', when=is_large_page)
+@cached_response(Product, Salt, Review)
 def get_products():
     """
     GET /api/products - Fetch medicine list with price, etc.
     """
     try:
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        # Allow larger per_page values for fetching all products
-        per_page = min(per_page, 1000)  # Cap at 1000 to prevent abuse
+        # Allow larger per_page values for fetching all products, capped at MAX_PER_PAGE
+        per_page = parse_per_page(request.args.get('per_page'), 20)
         search = request.args.get('search', '')
-        brand = request.args.get('brand', '')
-        category = request.args.get('category', '')
-        generic_name = request.args.get('generic_name', '')
-        exclude_id = request.args.get('exclude_id')
-        min_price = request.args.get('min_price', type=float)
-        max_price = request.args.get('max_price', type=float)
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        include = parse_include(request.args.get('include'))
+        fields = parse_fields(request.args.get('fields'), request.args.get('view'))
+        reviews_limit = parse_reviews_limit(request.args.get('reviews_limit', type=int))
+        with_facets = request.args.get('facets', 'false').lower() == 'true'
+        order = parse_sort(request.args.get('sort'), SORTS)
+        
+        if cursor is not None and search:
+            return jsonify({'error': 'Cursor pagination is not supported with search'}), 400
         
-        query = Product.query
+        query = select_fields(Product.query, fields)
+        if order is not None and fields and order[0].key not in ('created_at', *fields):
+            query = query.add_columns(order[0])  # cursors are built from the sort value
         
         # Apply filters
         if search:
-            query = query.filter(
-                or_(
-                    Product.name.ilike(f'%{search}%'),
-                    Product.generic_name.ilike(f'%{search}%'),
-                    Product.brand.ilike(f'%{search}%')
-                )
-            )
-        
-        if brand:
-            query = query.filter(Product.brand.ilike(f'%{brand}%'))
+            engine = get_search_engine()
+            # The in-memory index applies the other filters before cutting its ranking to SEARCH_MAX_RESULTS
+            restrict_to = listing_ids(request.args, Product.query) if isinstance(engine, InMemorySearchEngine) else None
+            query = engine.filter_query(query, search, restrict_to, request.args.get('exclude_id'))
         
-        if category:
-            query = query.filter(Product.category.ilike(f'%{category}%'))
+        query = filter_products(query, request.args)
         
-        if generic_name:
-            query = query.filter(Product.generic_name.ilike(f'%{generic_name}%'))
+        # Keyset pagination when a cursor is given (empty cursor = first page)
+        if cursor is not None:
+            items, meta = keyset_paginate(query, Product, cursor, per_page, include_total, order)
+            if with_facets:
+                meta['facets'] = facet_counts(request.args, Product.query)
+            return jsonify({
+                'products': serialize_products(items, include, fields, reviews_limit),
+                **meta
+            }), 200
         
-        if exclude_id:
-            query = query.filter(Product.id != exclude_id)
-        
-        if min_price is not None:
-            query = query.filter(Product.price >= min_price)
-        
-        if max_price is not None:
-            query = query.filter(Product.price <= max_price)
+        # An explicit sort replaces search relevance order
+        if order is not None:
+            query = query.order_by(None).order_by(*sort_columns(Product, order))
         
         # Paginate results
         products = query.paginate(
@@ -59,33 +132,173 @@ def get_products():
             error_out=False
         )
         
-        return jsonify({
-            'products': [product.to_dict() for product in products.items],
+        result = {
+            'products': serialize_products(products.items, include, fields, reviews_limit),
             'total': products.total,
             'pages': products.pages,
             'current_page': page,
             'per_page': per_page,
             'has_next': products.has_next,
             'has_prev': products.has_prev
+        }
+        if with_facets:
+            result['facets'] = facet_counts(request.args, Product.query)
+        
+        return jsonify(result), 200
+        
+    except (InvalidCursor, InvalidPageSize, InvalidSelection, InvalidSort) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@products_bp.route('/export', methods=['GET'])
+def export_catalog():
+    """
+    GET /api/products/export - Stream the whole catalog as NDJSON or CSV
+    
+    Supports ``format`` (ndjson, csv), ``include=salts``, ``fields``/``view``,
+    ``updated_since`` (ISO timestamp) for incremental syncs and ``gzip=true``.
+    The ``X-Export-Started-At`` header is the ``updated_since`` to use next time; it
+    lies EXPORT_OVERLAP before the export started, so some rows arrive twice.
+    Deleted products and salts are not exported: run a full export to drop them.
+    """
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        include = parse_include(request.args.get('include'))
+        fields = parse_fields(request.args.get('fields'), request.args.get('view'))
+        compress = request.args.get('gzip', 'false').lower() == 'true'
+        updated_since = request.args.get('updated_since')
+        
+        if 'reviews' in include:
+            return jsonify({'error': 'Exports can only include salts'}), 400
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'Unknown export format: {export_format}'}), 400
+        try:
+            updated_since = datetime.fromisoformat(updated_since) if updated_since else None
+        except ValueError:
+            return jsonify({'error': 'updated_since must be an ISO 8601 timestamp'}), 400
+        
+        started_at = datetime.utcnow()
+        body = export_products(
+            export_format, fields, include_salts='salts' in include,
+            updated_since=updated_since, compress=compress
+        )
+        
+        filename = f'products.{export_format}' + ('.gz' if compress else '')
+        response = Response(
+            stream_with_context(body),
+            mimetype='application/gzip' if compress else EXPORT_FORMATS[export_format]
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        response.headers['X-Export-Started-At'] = (started_at - EXPORT_OVERLAP).isoformat()
+        return response
+        
+    except (InvalidExport, InvalidSelection) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@products_bp.route('/batch', methods=['GET'])
+@cached_response(Product, Salt, Review)
+def get_products_batch():
+    """
+    GET /api/products/batch?ids=a,b,c - Get many products by ID in one query
+    """
+    try:
+        product_ids = parse_ids(request.args.get('ids'))
+        include = parse_include(request.args.get('include'))
+        fields = parse_fields(request.args.get('fields'), request.args.get('view'))
+        reviews_limit = parse_reviews_limit(request.args.get('reviews_limit', type=int))
+        
+        found = {
+            product.id: product
+            for product in load_fields(Product.query, fields).filter(Product.id.in_(product_ids))
+        }
+        products = [found[product_id] for product_id in product_ids if product_id in found]
+        
+        return jsonify({
+            'products': serialize_products(products, include, fields, reviews_limit),
+            'not_found': [product_id for product_id in product_ids if product_id not in found]
+        }), 200
+        
+    except (InvalidBatch, InvalidSelection) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@products_bp.route('/<product_id>/substitutes', methods=['GET'])
+@cached_response(Product, Salt, Review)
+def get_substitutes(product_id):
+    """
+    GET /api/products/{id}/substitutes - Products with the same salt composition, cheapest first
+    """
+    try:
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        cheaper_only = request.args.get('cheaper_only', 'false').lower() == 'true'
+        include = parse_include(request.args.get('include'))
+        fields = parse_fields(request.args.get('fields'), request.args.get('view'))
+        reviews_limit = parse_reviews_limit(request.args.get('reviews_limit', type=int))
+        
+        index = get_substitute_index()
+        substitute_ids = index.substitutes(product_id, cheaper_only=cheaper_only)
+        
+        if not substitute_ids and not Product.query.get(product_id):
+            return jsonify({'error': 'Product not found'}), 404
+        
+        page_ids = substitute_ids[:limit]
+        found = {
+            product.id: product
+            for product in load_fields(Product.query, fields).filter(Product.id.in_(page_ids))
+        } if page_ids else {}
+        products = [found[substitute_id] for substitute_id in page_ids if substitute_id in found]
+        
+        return jsonify({
+            'product_id': product_id,
+            'composition': [
+                {'salt_name': salt_name, 'strength': strength}
+                for salt_name, strength in index.composition(product_id)
+            ],
+            'substitutes': serialize_products(products, include, fields, reviews_limit),
+            'total': len(substitute_ids)
         }), 200
         
+    except InvalidSelection as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @products_bp.route('/<product_id>', methods=['GET'])
+@cached_response(Product, Salt, Review)
 def get_product(product_id):
     """
     GET /api/products/{id} - Get specific product details
+    
+    Salts and the newest reviews are embedded by default; use ``include``,
+    ``fields`` and ``reviews_limit`` to narrow the response.
     """
     try:
-        product = Product.query.get(product_id)
+        include = parse_include(request.args.get('include'), default=RELATIONS)
+        fields = parse_fields(request.args.get('fields'), request.args.get('view'))
+        reviews_limit = parse_reviews_limit(request.args.get('reviews_limit', type=int))
+        
+        # Concurrent product/salts/reviews queries when DETAIL_LOADER is threads or async
+        loader = get_detail_loader()
+        if loader is not None:
+            product = loader.load(product_id, include, fields, reviews_limit)
+            if product is None:
+                return jsonify({'error': 'Product not found'}), 404
+            return jsonify({'product': product}), 200
+        
+        product = load_fields(Product.query, fields).get(product_id)
         
         if not product:
             return jsonify({'error': 'Product not found'}), 404
         
         return jsonify({
-            'product': product.to_dict(include_relations=True)
+            'product': serialize_products([product], include, fields, reviews_limit)[0]
         }), 200
         
+    except InvalidSelection as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
-from models import Review, Product
-from sqlalchemy import func
+from models import Review, Product, ProductRatingSummary
+from services.cache import cached_response
+from services.pagination import InvalidCursor, InvalidPageSize, keyset_paginate, parse_per_page
+from services.batch import InvalidBatch, parse_ids
+from services.ratings import compute_summary, load_summaries
 
 reviews_bp = Blueprint('reviews', __name__)
 
@@ -12,13 +15,23 @@ def get_reviews():
     try:
         product_id = request.args.get('product_id')
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        per_page = parse_per_page(request.args.get('per_page'), 10)
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
         
         query = Review.query
         
         if product_id:
             query = query.filter_by(product_id=product_id)
         
+        # Keyset pagination when a cursor is given (empty cursor = first page)
+        if cursor is not None:
+            items, meta = keyset_paginate(query, Review, cursor, per_page, include_total)
+            return jsonify({
+                'reviews': [review.to_dict() for review in items],
+                **meta
+            }), 200
+        
         reviews = query.order_by(Review.created_at.desc()).paginate(
             page=page,
             per_page=per_page,
@@ -35,6 +48,8 @@ def get_reviews():
             'has_prev': reviews.has_prev
         }), 200
         
+    except (InvalidCursor, InvalidPageSize) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -56,36 +71,46 @@ def get_review(review_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@reviews_bp.route('/stats/batch', methods=['GET'])
+@cached_response(Product, Review)
+def get_review_stats_batch():
+    """
+    GET /api/reviews/stats/batch?ids=a,b,c - Get review statistics for many products
+    """
+    try:
+        product_ids = parse_ids(request.args.get('ids'))
+        summaries = load_summaries(product_ids)
+        
+        return jsonify({
+            'stats': {
+                product_id: summaries[product_id].to_dict()
+                for product_id in product_ids if product_id in summaries
+            },
+            'not_found': [product_id for product_id in product_ids if product_id not in summaries]
+        }), 200
+        
+    except InvalidBatch as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @reviews_bp.route('/stats/<product_id>', methods=['GET'])
+@cached_response(Product, Review)
 def get_review_stats(product_id):
     """
     GET /api/reviews/stats/{product_id} - Get review statistics for a product
     """
     try:
-        product = Product.query.get(product_id)
-        
-        if not product:
-            return jsonify({'error': 'Product not found'}), 404
+        summary = ProductRatingSummary.query.get(product_id)
         
-        # Get rating distribution
-        rating_stats = Review.query.with_entities(
-            Review.rating,
-            func.count(Review.rating).label('count')
-        ).filter_by(product_id=product_id).group_by(Review.rating).all()
+        if not summary:
+            # Not materialized yet (run `flask rebuild-ratings`); aggregate on the fly
+            summary = compute_summary(product_id)
         
-        total_reviews = sum(stat.count for stat in rating_stats)
-        avg_rating = product.avg_rating
-        
-        rating_distribution = {i: 0 for i in range(1, 6)}
-        for stat in rating_stats:
-            rating_distribution[stat.rating] = stat.count
+        if not summary:
+            return jsonify({'error': 'Product not found'}), 404
         
-        return jsonify({
-            'product_id': product_id,
-            'total_reviews': total_reviews,
-            'average_rating': avg_rating,
-            'rating_distribution': rating_distribution
-        }), 200
+        return jsonify(summary.to_dict()), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,9 +1,12 @@
 from flask import Blueprint, request, jsonify
 from models import Salt
+from services.cache import cached_response
+from services.pagination import InvalidCursor, InvalidPageSize, keyset_paginate, parse_per_page
 
 salts_bp = Blueprint('salts', __name__)
 
 @salts_bp.route('/', methods=['GET'])
+@cached_response(Salt)
 def get_salts():
     """
     GET /api/salts - Get tablet salt content
@@ -11,13 +14,23 @@ def get_salts():
     try:
         product_id = request.args.get('product_id')
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        per_page = parse_per_page(request.args.get('per_page'), 20)
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
         
         query = Salt.query
         
         if product_id:
             query = query.filter_by(product_id=product_id)
         
+        # Keyset pagination when a cursor is given (empty cursor = first page)
+        if cursor is not None:
+            items, meta = keyset_paginate(query, Salt, cursor, per_page, include_total)
+            return jsonify({
+                'salts': [salt.to_dict() for salt in items],
+                **meta
+            }), 200
+        
         salts = query.paginate(
             page=page,
             per_page=per_page,
@@ -34,6 +47,8 @@ def get_salts():
             'has_prev': salts.has_prev
         }), 200
         
+    except (InvalidCursor, InvalidPageSize) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,15 @@
+MAX_BATCH_SIZE = 100
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+def parse_ids(value, max_size=MAX_BATCH_SIZE):
+    """Parse an ``ids=a,b,c`` query argument, dropping blanks and duplicates"""
+    ids = list(dict.fromkeys(item.strip() for item in (value or '').split(',') if item.strip()))
+    if not ids:
+        raise InvalidBatch('At least one id is required')
+    if len(ids) > max_size:
+        raise InvalidBatch(f'At most {max_size} ids can be requested at once')
+    return ids
@@ -0,0 +1,274 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, make_response, request
+
+from services.changes import register_listener
+from services.compression import encode_response
+
+
+class CacheBackend:
+    """Storage for cached responses plus per-tag generation counters.
+
+    Entries are keyed by strings that embed the generations of their tags, so
+    bumping a tag's generation invalidates every entry that depends on it
+    without having to enumerate them.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_generation(self, tag):
+        raise NotImplementedError
+
+    def bump_generation(self, tag):
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """Never stores anything; responses still get ETags and 304s"""
+
+    def __init__(self):
+        self._generations = {}
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def get_generation(self, tag):
+        return self._generations.get(tag, 0)
+
+    def bump_generation(self, tag):
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+
+
+class LRUCache(CacheBackend):
+    """
+    In-process cache bounded by entry count, with a per-entry TTL.
+
+    Invalidation only reaches the process that committed the change; other
+    workers serve their copy until the TTL expires. Use the Redis backend
+    when several workers must agree.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if self.ttl and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_generation(self, tag):
+        return self._generations.get(tag, 0)
+
+    def bump_generation(self, tag):
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+
+class RedisCache(CacheBackend):
+    """Cache shared between worker processes, backed by Redis"""
+
+    def __init__(self, url, ttl=300, prefix='medingen:cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_BACKEND=redis requires the redis package')
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl or None)
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + '*'):
+            self._client.delete(key)
+
+    def get_generation(self, tag):
+        return int(self._client.get(f'{self.prefix}gen:{tag}') or 0)
+
+    def bump_generation(self, tag):
+        self._client.incr(f'{self.prefix}gen:{tag}')
+
+
+class RequestCoalescer:
+    """
+    Single-flight execution: concurrent calls with the same key share one run.
+
+    The first caller runs ``load``; callers arriving while it is in flight wait
+    for it and receive the same result. A waiter gets None when the run raised
+    or took longer than ``timeout`` seconds, and should then load on its own.
+    """
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> [threading.Event, result]
+
+    def run(self, key, load):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = [threading.Event(), None]
+        if not leader:
+            flight[0].wait(self.timeout)
+            return flight[1]
+        try:
+            flight[1] = load()
+            return flight[1]
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight[0].set()
+
+
+def create_backend(app):
+    backend = app.config.get('CACHE_BACKEND', 'memory')
+    ttl = app.config.get('CACHE_TTL', 300)
+    if backend == 'memory':
+        return LRUCache(max_entries=app.config.get('CACHE_MAX_ENTRIES', 1024), ttl=ttl)
+    if backend == 'redis':
+        return RedisCache(app.config['CACHE_REDIS_URL'], ttl=ttl)
+    if backend == 'none':
+        return NullCache()
+    raise ValueError(f'Unknown CACHE_BACKEND: {backend}')
+
+
+def init_cache(app):
+    """Create the response cache and invalidate it on committed model changes"""
+    cache = create_backend(app)
+    app.extensions['response_cache'] = cache
+    app.extensions['request_coalescer'] = (
+        RequestCoalescer(timeout=app.config.get('COALESCE_TIMEOUT', 10))
+        if app.config.get('COALESCE_REQUESTS', True) else None
+    )
+
+    def invalidate(changes):
+        for model in changes.models():
+            cache.bump_generation(model.__name__)
+
+    register_listener(app, invalidate)
+    return cache
+
+
+def get_cache():
+    return current_app.extensions['response_cache']
+
+
+def make_etag(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def _load_entry(view, args, kwargs, cache, key):
+    """Run the view; returns its response and, for a 200, the cache entry made from it"""
+    response = make_response(view(*args, **kwargs))
+    if response.status_code != 200:
+        return None, response
+    body = response.get_data()
+    entry = {
+        'body': body,
+        'mimetype': response.mimetype,
+        'etag': make_etag(body)
+    }
+    cache.set(key, entry)
+    return entry, response
+
+
+def _cache_key(cache, tags):
+    query = urlencode(sorted(request.args.items(multi=True)))
+    generations = ','.join(f'{tag}={cache.get_generation(tag)}' for tag in tags)
+    return f'{request.path}?{query}#{generations}'
+
+
+def cached_response(*models):
+    """
+    Cache a GET view's successful responses and answer conditional requests.
+
+    Entries are keyed by path and normalized query string and are invalidated
+    whenever a commit touches one of ``models``. Every 200 response carries a
+    strong ETag, and a matching ``If-None-Match`` is answered with a 304.
+    Concurrent misses for the same key run the view once and share its entry.
+    """
+    tags = tuple(model.__name__ for model in models)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            key = _cache_key(cache, tags)
+            entry = cache.get(key)
+
+            response = None
+            if entry is None:
+                coalescer = current_app.extensions.get('request_coalescer')
+                if coalescer is not None:
+                    def load():
+                        nonlocal response
+                        loaded, response = _load_entry(view, args, kwargs, cache, key)
+                        return loaded
+
+                    entry = coalescer.run(key, load)
+                if entry is None and response is None:
+                    entry, response = _load_entry(view, args, kwargs, cache, key)
+                if entry is None:
+                    return response
+            if response is None:
+                response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+
+            response.set_etag(entry['etag'])
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config.get('CACHE_MAX_AGE', 0)
+            response = response.make_conditional(request)
+            # Compressed bodies are kept in the entry so each variant is compressed once
+            if encode_response(response, entry.setdefault('encoded', {})):
+                cache.set(key, entry)
+            return response
+
+        return wrapper
+
+    return decorator
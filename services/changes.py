@@ -0,0 +1,190 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, select
+
+from models import db, CatalogDeletion, Product, Salt
+
+# Session.info key holding the changes collected since the last commit
+_PENDING_KEY = 'pending_changes'
+
+
+class ChangeSet:
+    """Committed inserts, updates and deletes grouped by model class.
+
+    Rows are captured as plain dict snapshots at flush time, because the ORM
+    instances are expired by the commit and must not emit SQL afterwards.
+    """
+
+    def __init__(self):
+        self._upserted = {}
+        self._deleted = {}
+
+    def record(self, obj, deleted=False):
+        self.add(type(obj), _snapshot(obj), deleted)
+
+    def add(self, model, row, deleted=False):
+        """Record a row dict directly, for changes found outside a session flush"""
+        key = (model, row.get('id'))
+        if deleted:
+            self._upserted.pop(key, None)
+            self._deleted[key] = row
+        else:
+            self._deleted.pop(key, None)
+            self._upserted[key] = row
+
+    def upserted(self, model):
+        return [row for (cls, _), row in self._upserted.items() if cls is model]
+
+    def deleted(self, model):
+        return [row for (cls, _), row in self._deleted.items() if cls is model]
+
+    def models(self):
+        return {cls for cls, _ in list(self._upserted) + list(self._deleted)}
+
+    def touches(self, *models):
+        return not self.models().isdisjoint(models)
+
+    def __bool__(self):
+        return bool(self._upserted or self._deleted)
+
+
+def _snapshot(obj):
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+def register_listener(app, listener):
+    """Call ``listener(changes)`` with a ChangeSet after every commit in ``app``"""
+    app.extensions.setdefault('change_listeners', []).append(listener)
+
+
+def init_changes(session):
+    """Attach the flush/commit hooks that feed registered listeners"""
+    if event.contains(session, 'after_flush', _after_flush):
+        return
+    event.listen(session, 'after_flush', _after_flush)
+    event.listen(session, 'after_commit', _after_commit)
+    event.listen(session, 'after_rollback', _after_rollback)
+
+
+def _after_flush(session, flush_context):
+    changes = session.info.setdefault(_PENDING_KEY, ChangeSet())
+    for obj in session.new:
+        changes.record(obj)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            changes.record(obj)
+    for obj in session.deleted:
+        changes.record(obj, deleted=True)
+
+
+def _after_commit(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes or not has_app_context():
+        return
+    for listener in current_app.extensions.get('change_listeners', []):
+        try:
+            listener(changes)
+        except Exception:
+            current_app.logger.exception('Change listener %r failed', listener)
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+class ExternalChangeWatcher:
+    """
+    Notices writes that never reach this process's session: CLI imports and other workers.
+
+    ``marker()`` reads a cheap value that changes whenever the watched tables
+    do (indexed ``max()`` lookups). At most every ``check_interval``
+    seconds ``check()`` compares it with the last value read and calls
+    ``on_change()`` when they differ.
+    """
+
+    def __init__(self, marker, on_change, check_interval=30):
+        self.marker = marker
+        self.on_change = on_change
+        self.check_interval = check_interval
+        self._last = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def mark(self, marker):
+        """Take ``marker`` as the value the loaded in-memory state corresponds to"""
+        with self._lock:
+            self._last = marker
+            self._checked_at = time.monotonic()
+
+    def check(self):
+        """True when the marker moved and ``on_change()`` ran"""
+        if not self.check_interval or time.monotonic() - self._checked_at < self.check_interval:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            current = self.marker()
+            changed = self._last is not None and current != self._last
+            self._last = current
+        finally:
+            self._lock.release()
+        if changed:
+            self.on_change()
+        return changed
+
+
+# Tombstones older than this are purged; warm-start snapshots older than it are not used
+DELETION_RETENTION = timedelta(days=7)
+
+catalog_deletions = CatalogDeletion.__table__
+
+
+def catalog_marker():
+    """
+    ``(products max(updated_at), salts max(updated_at), last tombstone id)``.
+
+    Inserts and updates stamp ``updated_at`` and deletes through the ORM leave
+    a tombstone, so every catalog write moves the marker; each part is one
+    index lookup, whatever the catalog size.
+    """
+    return tuple(db.session.execute(select(
+        select(func.max(Product.__table__.c.updated_at)).scalar_subquery(),
+        select(func.max(Salt.__table__.c.updated_at)).scalar_subquery(),
+        select(func.max(catalog_deletions.c.id)).scalar_subquery()
+    )).one())
+
+
+def _record_deletion(mapper, connection, target):
+    now = datetime.utcnow()
+    connection.execute(catalog_deletions.delete().where(catalog_deletions.c.deleted_at < now - DELETION_RETENTION))
+    connection.execute(catalog_deletions.insert().values(
+        table_name=mapper.local_table.name, row_id=target.id, deleted_at=now
+    ))
+
+
+def init_catalog_watcher(app):
+    """Rebuild the in-memory indexes and drop cached catalog responses when the catalog changes outside this process"""
+    def on_change():
+        app.logger.info('Catalog changed in another process; rebuilding in-memory indexes')
+        for name in ('search', 'facets', 'substitutes'):
+            app.extensions[name].invalidate()
+        cache = app.extensions['response_cache']
+        for model in (Product, Salt):
+            cache.bump_generation(model.__name__)
+
+    for model in (Product, Salt):
+        if not event.contains(model, 'after_delete', _record_deletion):
+            event.listen(model, 'after_delete', _record_deletion)
+
+    watcher = ExternalChangeWatcher(catalog_marker, on_change, app.config.get('CATALOG_REFRESH_INTERVAL', 30))
+    app.extensions['catalog_watcher'] = watcher
+
+    @app.before_request
+    def check_catalog():
+        watcher.check()
+
+    return watcher
@@ -0,0 +1,138 @@
+import re
+import zlib
+
+from flask import current_app, g, request
+
+try:
+    import brotli
+except ImportError:  # optional codec
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional codec
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+_VARIANT_ETAG_RE = re.compile(r'-(gzip|br|zstd)"')
+
+
+def _gzip(body):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip container
+    return compressor.compress(body) + compressor.flush()
+
+
+CODECS = {'gzip': _gzip}
+if brotli is not None:
+    CODECS['br'] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    CODECS['zstd'] = lambda body: zstandard.ZstdCompressor(level=3).compress(body)
+
+
+def parse_accept_encoding(header):
+    """``{coding: q}`` from an Accept-Encoding header"""
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def negotiate(header, preferences):
+    """Best coding in ``preferences`` (server order breaks ties) the client accepts, or None"""
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in preferences:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _preferences():
+    configured = current_app.config.get('COMPRESSION_ALGORITHMS', ('zstd', 'br', 'gzip'))
+    return [coding for coding in configured if coding in CODECS]
+
+
+def _compressible(response):
+    return any(response.mimetype.startswith(mimetype) for mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+def encode_response(response, variants=None):
+    """
+    Compress ``response`` in place with the negotiated coding.
+
+    ``variants`` is an optional ``{coding: bytes}`` store for a body that is
+    served repeatedly; a stored variant is reused instead of compressing
+    again. Returns True when a new variant was added to ``variants``.
+    """
+    if not current_app.config.get('COMPRESSION_ENABLED', True):
+        return False
+    if (response.status_code != 200 or response.is_streamed or 'Content-Encoding' in response.headers
+            or not _compressible(response)):
+        return False
+    response.vary.add('Accept-Encoding')
+    if response.content_length is not None and response.content_length < current_app.config['COMPRESSION_MIN_SIZE']:
+        return False
+    coding = negotiate(request.headers.get('Accept-Encoding'), _preferences())
+    if coding is None:
+        return False
+
+    added = False
+    if variants is not None and coding in variants:
+        body = variants[coding]
+    else:
+        body = CODECS[coding](response.get_data())
+        if variants is not None:
+            variants[coding] = body
+            added = True
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = coding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{coding}', weak)
+    return added
+
+
+def _strip_variant_etags():
+    """
+    Let views match If-None-Match against their uncompressed ETag.
+
+    Compressed responses carry ``"<etag>-<coding>"``; the suffix is removed
+    here and remembered so a 304 can echo the variant tag back.
+    """
+    header = request.environ.get('HTTP_IF_NONE_MATCH')
+    match = _VARIANT_ETAG_RE.search(header) if header else None
+    if match:
+        g.etag_variant = match.group(1)
+        request.environ['HTTP_IF_NONE_MATCH'] = _VARIANT_ETAG_RE.sub('"', header)
+
+
+def _compress_response(response):
+    if response.status_code == 304:
+        coding = g.get('etag_variant')
+        etag, weak = response.get_etag()
+        if etag and coding and coding == negotiate(request.headers.get('Accept-Encoding'), _preferences()):
+            response.set_etag(f'{etag}-{coding}', weak)
+        return response
+    encode_response(response)
+    return response
+
+
+def init_compression(app):
+    """Negotiated gzip/brotli/zstd compression for responses above COMPRESSION_MIN_SIZE"""
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+    app.before_request(_strip_variant_etags)
+    app.after_request(_compress_response)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import threading
+import time
+from bisect import bisect_left
+from types import MappingProxyType
+
+from flask import current_app
+from sqlalchemy import func
+
+from models import db, AppConfig
+from services.changes import register_listener
+
+
+class ConfigSnapshot:
+    """Immutable view of the whole ``app_config`` table.
+
+    ``version`` is a digest of the contents, so every worker holding the same
+    data reports the same version and it can be used directly as an ETag.
+    """
+
+    def __init__(self, configs, marker=None):
+        entries = {config.key: config.to_dict() for config in configs}
+        self.entries = MappingProxyType(entries)
+        self.values = MappingProxyType({key: entry['value'] for key, entry in entries.items()})
+        self.marker = marker
+        self.encoded = {}  # (route, key or category) -> {coding: compressed body}, filled by the config routes
+        self._keys = sorted(entries)
+        payload = json.dumps(entries, sort_keys=True, default=str).encode()
+        self.version = hashlib.sha256(payload).hexdigest()[:16]
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def by_prefix(self, prefix):
+        """Values of all keys starting with ``prefix``, in key order"""
+        result = {}
+        for key in self._keys[bisect_left(self._keys, prefix):]:
+            if not key.startswith(prefix):
+                break
+            result[key] = self.values[key]
+        return result
+
+
+class ConfigStore:
+    """
+    Serves the current ConfigSnapshot from memory.
+
+    The snapshot is reloaded after local commits that touch ``AppConfig``, on
+    an explicit ``reload()``, and when a periodic ``max(updated_at)``/count
+    check shows another process changed the table.
+    """
+
+    def __init__(self, check_interval=30):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _marker(self):
+        return tuple(db.session.query(func.max(AppConfig.updated_at), func.count(AppConfig.id)).one())
+
+    def reload(self):
+        with self._lock:
+            marker = self._marker()
+            self._snapshot = ConfigSnapshot(AppConfig.query.all(), marker)
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """Reload on next access (the session cannot run queries mid-commit)"""
+        self._snapshot = None
+
+    def prime(self, configs, marker):
+        """Serve ``configs`` (from a warm-start snapshot) until the first change check confirms them"""
+        with self._lock:
+            self._snapshot = ConfigSnapshot(configs, marker)
+            self._checked_at = 0.0
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.reload()
+        if self.check_interval and time.monotonic() - self._checked_at >= self.check_interval:
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._checked_at = time.monotonic()
+                    stale = self._marker() != snapshot.marker
+                finally:
+                    self._lock.release()
+                if stale:
+                    return self.reload()
+        return snapshot
+
+
+def init_config_store(app):
+    """Create the config store and reload it whenever AppConfig rows are committed"""
+    store = ConfigStore(check_interval=app.config.get('CONFIG_REFRESH_INTERVAL', 30))
+    app.extensions['config_store'] = store
+
+    def on_commit(changes):
+        if changes.touches(AppConfig):
+            store.invalidate()
+
+    register_listener(app, on_commit)
+    return store
+
+
+def get_config_store():
+    return current_app.extensions['config_store']
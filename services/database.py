@@ -0,0 +1,141 @@
+import threading
+import time
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from services.ids import set_id_storage
+from services.metrics import DURATION_BUCKETS, Histogram
+
+REPLICA_BIND = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits = Histogram(DURATION_BUCKETS)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+                self._waits.observe(waited)
+
+    def wait_histogram(self):
+        """Copy of the checkout wait times histogram (seconds)"""
+        with self._stats_lock:
+            histogram = Histogram(self._waits.buckets)
+            histogram.counts = list(self._waits.counts)
+            histogram.sum = self._waits.sum
+            return histogram
+
+    def stats(self):
+        capacity = self.size() + self._max_overflow if self._max_overflow >= 0 else None
+        checked_out = self.checkedout()
+        with self._stats_lock:
+            return {
+                'size': self.size(),
+                'max_overflow': self._max_overflow,
+                'checked_out': checked_out,
+                'checked_in': self.checkedin(),
+                'overflow': self.overflow(),
+                'utilization': round(checked_out / capacity, 3) if capacity else None,
+                'checkouts': self.checkouts,
+                'checkout_timeouts': self.checkout_timeouts,
+                'checkout_wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'checkout_wait_max_ms': round(self.wait_max * 1000, 3)
+            }
+
+
+class RoutingSession(Session):
+    """Session that sends reads made while serving GET requests to the replica bind.
+
+    Flushes and every other request method stay on the primary. Without a
+    configured replica this behaves exactly like the default session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('use_replica'):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _pool_options(app, uri):
+    if uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:'):
+        return {}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': app.config['DB_POOL_SIZE'],
+        'max_overflow': app.config['DB_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': app.config['DB_POOL_PRE_PING']
+    }
+
+
+def init_database(app):
+    """
+    Apply pool settings and read-replica routing before ``db.init_app``.
+
+    Pool options are only passed to pooled engines; in-memory SQLite keeps its
+    single-connection pool. The ID storage mode is fixed here, before any
+    engine compiles a statement.
+    """
+    set_id_storage(app.config.get('ID_STORAGE', 'string'))
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **_pool_options(app, app.config['SQLALCHEMY_DATABASE_URI']), **options
+    }
+
+    replica_uri = app.config.get('DATABASE_REPLICA_URL')
+    if replica_uri:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = {'url': replica_uri, **_pool_options(app, replica_uri), **options}
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+        @app.before_request
+        def route_reads_to_replica():
+            g.use_replica = request.method in READ_METHODS
+
+
+def pool_wait_histograms(engines):
+    """Checkout wait histogram for every instrumented pool, keyed by bind name"""
+    return {
+        bind_key or 'primary': engine.pool.wait_histogram()
+        for bind_key, engine in engines.items() if isinstance(engine.pool, InstrumentedQueuePool)
+    }
+
+
+def pool_stats(engines):
+    """Pool statistics for every engine, keyed by bind name"""
+    stats = {}
+    for bind_key, engine in engines.items():
+        pool = engine.pool
+        name = bind_key or 'primary'
+        if isinstance(pool, InstrumentedQueuePool):
+            stats[name] = pool.stats()
+        else:
+            stats[name] = {'status': pool.status()}
+    return stats
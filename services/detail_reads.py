@@ -0,0 +1,161 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+
+from models import db, Product, Salt, Review
+from services.database import REPLICA_BIND
+from services.serializers import PRODUCT_FIELDS, product_data
+
+products = Product.__table__
+salts = Salt.__table__
+reviews = Review.__table__
+
+# Sync driver -> asyncio driver used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+}
+
+
+def _statements(product_id, include, fields, reviews_limit):
+    """The independent SELECTs behind one product detail response"""
+    columns = dict.fromkeys(['id', 'created_at', *(fields or PRODUCT_FIELDS)])
+    statements = {
+        'product': select(*(products.c[column] for column in columns)).where(products.c.id == product_id)
+    }
+    if 'salts' in include:
+        statements['salts'] = select(salts).where(
+            salts.c.product_id == product_id
+        ).order_by(salts.c.created_at, salts.c.id)
+    if 'reviews' in include and reviews_limit > 0:
+        statements['reviews'] = select(reviews).where(
+            reviews.c.product_id == product_id
+        ).order_by(reviews.c.created_at.desc(), reviews.c.id.desc()).limit(reviews_limit + 1)
+    return statements
+
+
+def _assemble(results, include, fields, reviews_limit):
+    """Same payload as ``serialize_products`` for one product; None when it does not exist"""
+    if not results['product']:
+        return None
+    data = product_data(results['product'][0], fields)
+    if 'salts' in include:
+        data['salts'] = [dict(row._mapping) for row in results['salts']]
+    if 'reviews' in include:
+        found = results.get('reviews', [])
+        data['reviews'] = [dict(row._mapping) for row in found[:reviews_limit]]
+        data['has_more_reviews'] = len(found) > reviews_limit
+    return data
+
+
+class ThreadedDetailLoader:
+    """
+    Runs the product, salts and reviews queries at once on separate pooled connections.
+
+    Uses the existing sync driver; a detail request holds up to three
+    connections for the duration of its slowest query.
+    """
+
+    def __init__(self, workers=8):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='detail-reads')
+
+    @staticmethod
+    def _fetch(engine, statement):
+        with engine.connect() as connection:
+            return connection.execute(statement).all()
+
+    def load(self, product_id, include, fields, reviews_limit):
+        engine = db.engines.get(REPLICA_BIND) or db.engine
+        statements = _statements(product_id, include, fields, reviews_limit)
+        futures = {name: self._executor.submit(self._fetch, engine, statement) for name, statement in statements.items()}
+        return _assemble({name: future.result() for name, future in futures.items()}, include, fields, reviews_limit)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class AsyncDetailLoader:
+    """
+    Runs the detail queries concurrently on an asyncio driver (aiomysql, aiosqlite).
+
+    One background event loop owns the async engine and its pool, so the
+    connections are shared by every request thread; each request submits its
+    queries to the loop and waits for them together.
+    """
+
+    def __init__(self, url, pool_options=None, timeout=10):
+        try:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            self._engine = create_async_engine(url, **(pool_options or {}))
+        except ImportError as e:
+            raise RuntimeError(f'DETAIL_LOADER=async requires an asyncio database driver: {e}')
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='detail-reads', daemon=True)
+        self._thread.start()
+
+    async def _fetch(self, statement):
+        async with self._engine.connect() as connection:
+            return (await connection.execute(statement)).all()
+
+    async def _fetch_all(self, statements):
+        results = await asyncio.gather(*(self._fetch(statement) for statement in statements.values()))
+        return dict(zip(statements, results))
+
+    def load(self, product_id, include, fields, reviews_limit):
+        statements = _statements(product_id, include, fields, reviews_limit)
+        future = asyncio.run_coroutine_threadsafe(self._fetch_all(statements), self._loop)
+        return _assemble(future.result(timeout=self.timeout), include, fields, reviews_limit)
+
+    def shutdown(self):
+        asyncio.run_coroutine_threadsafe(self._engine.dispose(), self._loop).result(timeout=self.timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def async_database_url(app):
+    """ASYNC_DATABASE_URL, or the replica/primary URL with its driver swapped for an asyncio one"""
+    if app.config.get('ASYNC_DATABASE_URL'):
+        return app.config['ASYNC_DATABASE_URL']
+    url = make_url(app.config.get('DATABASE_REPLICA_URL') or app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.drivername not in ASYNC_DRIVERS:
+        raise ValueError(f'No asyncio driver known for {url.drivername}; set ASYNC_DATABASE_URL')
+    return url.set(drivername=ASYNC_DRIVERS[url.drivername])
+
+
+def init_detail_reads(app):
+    """Create the loader selected by DETAIL_LOADER (``sequential`` keeps the ORM path)"""
+    previous = app.extensions.get('detail_loader')
+    if previous is not None:
+        previous.shutdown()
+
+    mode = app.config.get('DETAIL_LOADER', 'sequential')
+    if mode == 'sequential':
+        loader = None
+    elif mode == 'threads':
+        loader = ThreadedDetailLoader(workers=app.config.get('DETAIL_LOADER_WORKERS', 8))
+    elif mode == 'async':
+        url = async_database_url(app)
+        options = {}
+        if not str(url).startswith('sqlite'):
+            options = {
+                'pool_size': app.config['DB_POOL_SIZE'],
+                'max_overflow': app.config['DB_MAX_OVERFLOW'],
+                'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+                'pool_recycle': app.config['DB_POOL_RECYCLE'],
+                'pool_pre_ping': app.config['DB_POOL_PRE_PING']
+            }
+        loader = AsyncDetailLoader(url, options, timeout=app.config['DB_POOL_TIMEOUT'])
+    else:
+        raise ValueError(f'Unknown DETAIL_LOADER: {mode}')
+    app.extensions['detail_loader'] = loader
+    return loader
+
+
+def get_detail_loader():
+    return current_app.extensions.get('detail_loader')
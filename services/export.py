@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+import zlib
+from datetime import timedelta
+
+from sqlalchemy import or_, select
+
+from models import db, Product, Salt
+from services.serializers import load_fields, load_salts
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+# The next ``updated_since`` is moved back this far from the export's start, so rows committed
+# by transactions still open when it started (or stamped by a skewed clock) are exported again
+EXPORT_OVERLAP = timedelta(seconds=60)
+
+
+class InvalidExport(ValueError):
+    pass
+
+
+def iter_product_chunks(fields=None, updated_since=None, chunk_size=1000):
+    """
+    Yield lists of products in primary-key order, ``chunk_size`` at a time.
+
+    Each chunk is its own keyset query (``id > last id``), so memory stays
+    bounded by one chunk and related rows can be looked up between chunks on
+    the same connection. Loaded objects are expunged once a chunk is handed
+    on, keeping the session's identity map from growing with the catalog.
+
+    ``updated_since`` keeps products whose row or one of whose salts was
+    inserted or updated at or after it. Deletes are not reported.
+    """
+    last_id = None
+    while True:
+        query = load_fields(Product.query, fields)
+        if updated_since is not None:
+            changed_salts = select(Salt.product_id).where(Salt.updated_at >= updated_since)
+            query = query.filter(or_(Product.updated_at >= updated_since, Product.id.in_(changed_salts)))
+        if last_id is not None:
+            query = query.filter(Product.id > last_id)
+        chunk = query.order_by(Product.id).limit(chunk_size).all()
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+        db.session.expunge_all()
+        if len(chunk) < chunk_size:
+            return
+
+
+def _product_rows(fields, include_salts, updated_since, chunk_size):
+    for chunk in iter_product_chunks(fields, updated_since, chunk_size):
+        salts_by_product = load_salts([product.id for product in chunk]) if include_salts else None
+        for product in chunk:
+            data = product.to_dict(fields=fields)
+            if salts_by_product is not None:
+                data['salts'] = [salt.to_dict() for salt in salts_by_product[product.id]]
+            yield data
+
+
+def _ndjson_lines(rows):
+    for data in rows:
+        yield json.dumps(data, separators=(',', ':'), default=str) + '\n'
+
+
+def _csv_lines(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(values)
+        return buffer.getvalue()
+
+    yield line(columns)
+    for data in rows:
+        yield line([
+            json.dumps(value, separators=(',', ':')) if isinstance(value, (list, dict)) else value
+            for value in (data.get(column) for column in columns)
+        ])
+
+
+def _buffered(lines, size=64 * 1024):
+    """Join small lines into roughly ``size``-character chunks"""
+    parts = []
+    length = 0
+    for line in lines:
+        parts.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield ''.join(parts)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_products(export_format, fields=None, include_salts=False, updated_since=None,
+                    compress=False, chunk_size=1000):
+    """Generator producing the export body in ``export_format``, optionally gzipped"""
+    if export_format not in EXPORT_FORMATS:
+        raise InvalidExport(f'Unknown export format: {export_format}')
+
+    rows = _product_rows(fields, include_salts, updated_since, chunk_size)
+    if export_format == 'csv':
+        columns = list(fields or Product.PUBLIC_FIELDS) + (['salts'] if include_salts else [])
+        lines = _csv_lines(rows, columns)
+    else:
+        lines = _ndjson_lines(rows)
+
+    chunks = _buffered(lines)
+    if compress:
+        return _gzipped(chunks)
+    return (chunk.encode() for chunk in chunks)
@@ -0,0 +1,273 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+from flask import current_app
+
+from models import db, Product
+from services.changes import register_listener
+from services.search import InMemorySearchEngine, get_search_engine
+
+FACETS = ('brand', 'category', 'price', 'prescription_required')
+DEFAULT_PRICE_BUCKETS = (50, 100, 200, 500, 1000)
+
+
+def _intersect(sets):
+    sets = sorted(sets, key=len)
+    result = set(sets[0])
+    for other in sets[1:]:
+        result &= other
+        if not result:
+            break
+    return result
+
+
+def _count(base, ids):
+    if base is None:
+        return len(ids)
+    small, large = (ids, base) if len(ids) < len(base) else (base, ids)
+    return sum(1 for product_id in small if product_id in large)
+
+
+class FacetIndex:
+    """
+    Per-value product ID sets for the catalog sidebar facets.
+
+    Counts for a facet are taken over the products matching every *other*
+    active filter, so the sidebar keeps offering alternatives to the value
+    the shopper already picked. The index is built on first use and then
+    maintained from committed Product changes.
+    """
+
+    def __init__(self, price_buckets=DEFAULT_PRICE_BUCKETS):
+        self.price_buckets = tuple(sorted(price_buckets))
+        self._lock = threading.RLock()
+        self._built = False
+        self._reset()
+
+    def _reset(self):
+        self._products = {}  # product_id -> {facet: value}
+        self._values = {facet: {} for facet in FACETS}  # facet -> value -> set(product_id)
+        self._labels = {'brand': {}, 'category': {}}  # normalized value -> display label
+        self._by_price = []  # sorted (price, product_id)
+
+    def price_bucket(self, price):
+        position = bisect_right(self.price_buckets, price)
+        if position == len(self.price_buckets):
+            return f'{self.price_buckets[-1]}+'
+        lower = self.price_buckets[position - 1] if position else 0
+        return f'{lower}-{self.price_buckets[position]}'
+
+    # Index maintenance
+
+    def rebuild(self, products=None):
+        """Build from the database, or from ``products`` rows (a warm-start snapshot)"""
+        with self._lock:
+            self._reset()
+            if products is None:
+                products = db.session.query(
+                    Product.id, Product.brand, Product.category, Product.price, Product.prescription_required
+                ).yield_per(1000)
+            for row in products:
+                self._add(row._asdict())
+            self._built = True
+
+    def invalidate(self):
+        """Rebuild on next use, after writes that bypassed the ORM session"""
+        with self._lock:
+            self._built = False
+            self._reset()
+
+    def apply_changes(self, changes):
+        if not changes.touches(Product):
+            return
+        with self._lock:
+            if not self._built:
+                return
+            for row in changes.deleted(Product):
+                self._remove(row['id'])
+            for row in changes.upserted(Product):
+                self._remove(row['id'])
+                self._add(row)
+
+    def _add(self, row):
+        values = {
+            'brand': Product.normalize(row['brand']),
+            'category': Product.normalize(row['category']),
+            'price': self.price_bucket(row['price']),
+            'prescription_required': 'true' if row['prescription_required'] else 'false'
+        }
+        product_id = row['id']
+        self._products[product_id] = dict(values, _price=row['price'])
+        for facet, value in values.items():
+            if value is None:
+                continue
+            self._values[facet].setdefault(value, set()).add(product_id)
+            if facet in self._labels:
+                self._labels[facet][value] = row[facet].strip()
+        insort(self._by_price, (row['price'], product_id))
+
+    def _remove(self, product_id):
+        values = self._products.pop(product_id, None)
+        if values is None:
+            return
+        for facet in FACETS:
+            ids = self._values[facet].get(values[facet])
+            if ids is None:
+                continue
+            ids.discard(product_id)
+            if not ids:
+                del self._values[facet][values[facet]]
+                if facet in self._labels:
+                    self._labels[facet].pop(values[facet], None)
+        position = bisect_left(self._by_price, (values['_price'], product_id))
+        if position < len(self._by_price) and self._by_price[position] == (values['_price'], product_id):
+            del self._by_price[position]
+
+    # Counting
+
+    def _price_range(self, min_price, max_price):
+        start = 0 if min_price is None else bisect_left(self._by_price, (min_price,))
+        end = len(self._by_price)
+        if max_price is not None:
+            end = bisect_right(self._by_price, (max_price, chr(0x10FFFF)))
+        return {product_id for _, product_id in self._by_price[start:end]}
+
+    def _constraints(self, brand, category, min_price, max_price, prescription_required):
+        """Facet -> ID set for each active filter"""
+        constraints = {}
+        if brand:
+            constraints['brand'] = self._values['brand'].get(Product.normalize(brand), set())
+        if category:
+            constraints['category'] = self._values['category'].get(Product.normalize(category), set())
+        if min_price is not None or max_price is not None:
+            constraints['price'] = self._price_range(min_price, max_price)
+        if prescription_required is not None:
+            key = 'true' if prescription_required else 'false'
+            constraints['prescription_required'] = self._values['prescription_required'].get(key, set())
+        return constraints
+
+    def matching(self, brand=None, category=None, min_price=None, max_price=None,
+                 prescription_required=None):
+        """IDs of the products passing every given filter; None when no filter is given"""
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+            constraints = self._constraints(brand, category, min_price, max_price, prescription_required)
+            return _intersect(constraints.values()) if constraints else None
+
+    def counts(self, brand=None, category=None, min_price=None, max_price=None,
+               prescription_required=None, restrict_to=None, exclude_id=None):
+        """
+        Facet value counts for a filter set.
+
+        ``restrict_to`` is an optional ID set from filters the index does not
+        cover (search, generic name); ``None`` means no such filter.
+        """
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+
+            constraints = self._constraints(brand, category, min_price, max_price, prescription_required)
+            shared = [restrict_to] if restrict_to is not None else []
+
+            result = {}
+            for facet in FACETS:
+                others = shared + [ids for name, ids in constraints.items() if name != facet]
+                base = _intersect(others) if others else None
+
+                counts = {}
+                for value, ids in self._values[facet].items():
+                    count = _count(base, ids)
+                    if exclude_id in ids and (base is None or exclude_id in base):
+                        count -= 1
+                    if count:
+                        counts[self._labels[facet].get(value, value) if facet in self._labels else value] = count
+                result[facet] = counts
+
+            result['price'] = {
+                bucket: result['price'].get(bucket, 0) for bucket in self._bucket_labels()
+            }
+            return result
+
+    def _bucket_labels(self):
+        labels = [self.price_bucket(0)]
+        labels += [self.price_bucket(boundary) for boundary in self.price_buckets]
+        return labels
+
+
+def _parse_bool(value):
+    if value is None or value == '':
+        return None
+    return value.lower() in ('true', '1', 'yes')
+
+
+def listing_ids(args, base_query):
+    """
+    IDs passing a product listing's filters, for the search index to apply before it truncates its ranking.
+
+    ``generic_name`` is not in the facet index and is evaluated against
+    ``base_query``. None when the listing has no filters; ``exclude_id`` is
+    left to the search (copying every catalog ID to drop one would cost more).
+    """
+    ids = get_facet_index().matching(
+        brand=args.get('brand'),
+        category=args.get('category'),
+        min_price=args.get('min_price', type=float),
+        max_price=args.get('max_price', type=float),
+        prescription_required=_parse_bool(args.get('prescription_required'))
+    )
+    generic_name = args.get('generic_name', '')
+    if generic_name:
+        query = base_query.filter(Product.generic_name.ilike(f'%{generic_name}%')).with_entities(Product.id)
+        matches = {product_id for (product_id,) in query}
+        ids = matches if ids is None else ids & matches
+    return ids
+
+
+def facet_counts(args, base_query):
+    """
+    Facet counts for a product listing request.
+
+    Filters the facet index cannot answer (``search`` with a non-memory
+    backend, ``generic_name``) are evaluated once against ``base_query`` to
+    produce the restricting ID set.
+    """
+    index = get_facet_index()
+    search = args.get('search', '')
+    generic_name = args.get('generic_name', '')
+    engine = get_search_engine()
+
+    restrict_to = None
+    if search and isinstance(engine, InMemorySearchEngine):
+        # Every match, not just the first SEARCH_MAX_RESULTS of the ranking
+        restrict_to = set(engine.search(search, capped=False))
+        search = ''
+    if search or generic_name:
+        query = base_query
+        if search:
+            query = engine.filter_query(query, search).order_by(None)
+        if generic_name:
+            query = query.filter(Product.generic_name.ilike(f'%{generic_name}%'))
+        matches = {product_id for (product_id,) in query.with_entities(Product.id)}
+        restrict_to = matches if restrict_to is None else restrict_to & matches
+
+    return index.counts(
+        brand=args.get('brand'),
+        category=args.get('category'),
+        min_price=args.get('min_price', type=float),
+        max_price=args.get('max_price', type=float),
+        prescription_required=_parse_bool(args.get('prescription_required')),
+        restrict_to=restrict_to,
+        exclude_id=args.get('exclude_id')
+    )
+
+
+def init_facets(app):
+    index = FacetIndex(price_buckets=app.config.get('FACET_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS))
+    app.extensions['facets'] = index
+    register_listener(app, index.apply_changes)
+    return index
+
+
+def get_facet_index():
+    return current_app.extensions['facets']
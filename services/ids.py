@@ -0,0 +1,93 @@
+import os
+import time
+import uuid
+
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.types import LargeBinary, String, TypeDecorator
+
+ID_STORAGE_MODES = ('string', 'binary')
+
+# Process-wide, set from ID_STORAGE by init_database before any engine exists
+_storage = {'mode': 'string'}
+
+
+def set_id_storage(mode):
+    if mode not in ID_STORAGE_MODES:
+        raise ValueError(f'Unknown ID_STORAGE: {mode}')
+    _storage['mode'] = mode
+
+
+def get_id_storage():
+    return _storage['mode']
+
+
+def uuid7():
+    """
+    Time-ordered UUID (RFC 9562 version 7): 48-bit Unix milliseconds, then random bits.
+
+    Keys generated later sort after earlier ones, so inserts append to the
+    right-hand edge of the primary key index instead of splitting random pages.
+    """
+    value = (int(time.time() * 1000) & 0xFFFFFFFFFFFF) << 80
+    value |= int.from_bytes(os.urandom(10), 'big')
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
+def _as_uuid(value):
+    if isinstance(value, uuid.UUID):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return uuid.UUID(bytes=bytes(value))
+    return uuid.UUID(value)
+
+
+def is_storable_id(value):
+    """False for a value that a UUIDKey column cannot hold, and would bind as NULL"""
+    if get_id_storage() == 'string':
+        return True
+    try:
+        _as_uuid(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+class UUIDKey(TypeDecorator):
+    """
+    UUID column that is always a canonical string in Python.
+
+    With ``string`` storage it is the original VARCHAR(36) column and values
+    pass through untouched. With ``binary`` storage it holds the 16 raw bytes
+    (BINARY(16) on MySQL, native UUID on PostgreSQL); there, values that are
+    not UUIDs bind as NULL, so looking up a malformed ID finds nothing
+    instead of raising.
+    """
+    impl = String(36)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if get_id_storage() == 'string':
+            return dialect.type_descriptor(String(36))
+        if dialect.name == 'mysql':
+            return dialect.type_descriptor(mysql.BINARY(16))
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if get_id_storage() == 'string':
+            return value if isinstance(value, str) else str(_as_uuid(value))
+        try:
+            value = _as_uuid(value)
+        except (TypeError, ValueError):
+            return None
+        return str(value) if dialect.name == 'postgresql' else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str) and get_id_storage() == 'string':
+            return value
+        return str(_as_uuid(value))
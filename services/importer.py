@@ -0,0 +1,474 @@
+import csv
+import gzip
+import json
+import time
+import uuid
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, bindparam, select, tuple_
+
+from models import db, generate_uuid, Product, Salt, Review
+from services.ratings import rebuild_summaries
+from services.substitutes import normalize_salt_name
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_KINDS = ('products', 'salts', 'reviews')
+
+products = Product.__table__
+salts = Salt.__table__
+reviews = Review.__table__
+
+# Columns a products file may set; ids and timestamps are managed here
+PRODUCT_FIELDS = tuple(
+    field for field in Product.PUBLIC_FIELDS if field not in ('id', 'avg_rating', 'created_at', 'updated_at')
+)
+SALT_FIELDS = ('salt_name', 'strength')
+REVIEW_FIELDS = ('user_name', 'rating', 'comment', 'created_at')
+
+# Validation messages kept per import; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+class ImportReport:
+    """Running totals for one import, also used for progress output"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.read = 0
+        self.inserted = 0
+        self.updated = 0
+        self.invalid = 0
+        self.errors = []  # (line, message)
+        self.started = time.perf_counter()
+
+    def reject(self, line, error):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, str(error)))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f'{self.kind}: {self.read} rows read, {self.inserted} inserted, {self.updated} updated, '
+            f'{self.invalid} invalid ({self.rate:,.0f} rows/s)'
+        )
+
+
+# Reading
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    raise InvalidImport(f'Cannot tell the format of {path}; pass --format')
+
+
+def open_source(path):
+    if path == '-':
+        return click.get_text_stream('stdin')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(stream, file_format):
+    """
+    Yield ``(line, row)`` pairs from a CSV or NDJSON stream.
+
+    Lines that cannot be decoded are yielded as InvalidRow instances so they
+    are reported together with rows that fail validation.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as e:
+            yield line, InvalidRow(f'Invalid JSON: {e}')
+            continue
+        yield line, row if isinstance(row, dict) else InvalidRow('Expected a JSON object')
+
+
+# Validation
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('true', '1', 'yes'):
+        return True
+    if text in ('false', '0', 'no'):
+        return False
+    raise InvalidRow(f'Expected a boolean, got {value!r}')
+
+
+def _coerce(column, value):
+    """Convert a CSV string or JSON value to the Python type of ``column``"""
+    if value is None or value == '':
+        if not column.nullable:
+            raise InvalidRow(f'{column.name} is required')
+        return None
+    try:
+        if isinstance(column.type, Boolean):
+            return _parse_bool(value)
+        if isinstance(column.type, Integer):
+            return int(value)
+        if isinstance(column.type, Float):
+            return float(value)
+        if isinstance(column.type, DateTime):
+            return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise InvalidRow(f'{column.name}: {e}')
+    value = str(value).strip()
+    if isinstance(column.type, String) and column.type.length and len(value) > column.type.length:
+        raise InvalidRow(f'{column.name} is longer than {column.type.length} characters')
+    return value
+
+
+def _json_text(name, value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    try:
+        json.loads(value)
+    except ValueError:
+        raise InvalidRow(f'{name} must be JSON')
+    return value
+
+
+def validate_product(row):
+    data = {}
+    for field in PRODUCT_FIELDS:
+        if field not in row:
+            if not products.c[field].nullable:
+                raise InvalidRow(f'{field} is required')
+            continue
+        if field in Product.JSON_FIELDS and row[field] not in (None, ''):
+            data[field] = _json_text(field, row[field])
+        else:
+            data[field] = _coerce(products.c[field], row[field])
+    if data['price'] < 0:
+        raise InvalidRow('price must not be negative')
+    data['brand_normalized'] = Product.normalize(data['brand'])
+    if 'category' in data:
+        data['category_normalized'] = Product.normalize(data['category'])
+
+    product_id = row.get('id') or None
+    if product_id is not None:
+        try:
+            uuid.UUID(str(product_id))
+        except ValueError:
+            raise InvalidRow(f'id {product_id!r} is not a UUID')
+
+    product_salts = row.get('salts')
+    if isinstance(product_salts, str) and product_salts:
+        product_salts = json.loads(product_salts)
+    return {
+        'id': product_id,
+        'values': data,
+        'salts': [validate_salt(salt, nested=True) for salt in product_salts or []]
+    }
+
+
+def _product_ref(row):
+    if row.get('product_id'):
+        return ('id', row['product_id'])
+    if row.get('product_brand') and row.get('product_name'):
+        return ('key', (Product.normalize(row['product_brand']), row['product_name'].strip()))
+    raise InvalidRow('product_id, or product_brand and product_name, is required')
+
+
+def validate_salt(row, nested=False):
+    if not isinstance(row, dict):
+        raise InvalidRow('Each salt must be an object')
+    data = {field: _coerce(salts.c[field], row.get(field)) for field in SALT_FIELDS}
+    return {'values': data} if nested else {'product': _product_ref(row), 'values': data}
+
+
+def validate_review(row):
+    data = {field: _coerce(reviews.c[field], row.get(field)) for field in REVIEW_FIELDS}
+    if not 1 <= data['rating'] <= 5:
+        raise InvalidRow('rating must be between 1 and 5')
+    if data['created_at'] is None:
+        del data['created_at']
+    return {'product': _product_ref(row), 'values': data}
+
+
+VALIDATORS = {
+    'products': validate_product,
+    'salts': validate_salt,
+    'reviews': validate_review,
+}
+
+
+# Writing
+
+def _execute_many(connection, statement, rows):
+    """executemany ``rows``, grouped by key set since every row of a batch must bind the same keys"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    for group in groups.values():
+        connection.execute(statement, group)
+
+
+def _upsert(connection, table, inserts, updates):
+    """Insert new rows and update existing ones (identified by ``_id``) with executemany"""
+    _execute_many(connection, table.insert(), inserts)
+    groups = {}
+    for row in updates:
+        groups.setdefault(tuple(sorted(key for key in row if key != '_id')), []).append(row)
+    for keys, group in groups.items():
+        # Bind names must differ from column names in an UPDATE's SET clause
+        statement = table.update().where(table.c.id == bindparam('_id')).values(
+            {key: bindparam(f'_{key}') for key in keys}
+        )
+        connection.execute(statement, [
+            dict({f'_{key}': row[key] for key in keys}, _id=row['_id']) for row in group
+        ])
+
+
+def _resolve_products(connection, refs):
+    """Map ``('id', id)`` and ``('key', (brand, name))`` references to existing product IDs"""
+    ids = {value for kind, value in refs if kind == 'id'}
+    keys = {value for kind, value in refs if kind == 'key'}
+    found = {}
+    if ids:
+        for (product_id,) in connection.execute(select(products.c.id).where(products.c.id.in_(ids))):
+            found[('id', product_id)] = product_id
+    if keys:
+        rows = connection.execute(
+            select(products.c.id, products.c.brand_normalized, products.c.name).where(
+                tuple_(products.c.brand_normalized, products.c.name).in_(keys)
+            )
+        )
+        for row in rows:
+            found[('key', (row.brand_normalized, row.name))] = row.id
+    return found
+
+
+def _upsert_salts(connection, entries):
+    """Upsert ``(product_id, values)`` salts keyed by product and normalized salt name"""
+    existing = {}
+    product_ids = {product_id for product_id, _ in entries}
+    rows = connection.execute(
+        select(salts.c.id, salts.c.product_id, salts.c.salt_name).where(salts.c.product_id.in_(product_ids))
+    )
+    for row in rows:
+        existing[(row.product_id, normalize_salt_name(row.salt_name))] = row.id
+
+    inserts, updates = {}, {}
+    for product_id, values in entries:
+        key = (product_id, normalize_salt_name(values['salt_name']))
+        if key in existing:
+            updates[key] = dict(values, _id=existing[key])
+        else:
+            inserts[key] = dict(values, id=generate_uuid(), product_id=product_id)
+    _upsert(connection, salts, list(inserts.values()), list(updates.values()))
+    return len(inserts), len(updates)
+
+
+def _write_products(connection, chunk, report):
+    by_key = {}
+    for line, entry in chunk:
+        values = entry['values']
+        key = (values['brand_normalized'], values['name'])
+        earlier = by_key.get(key)
+        if earlier:
+            # The last row's fields win; the salts of every row are kept, a repeated salt taking the last values
+            entry = dict(entry, id=entry['id'] or earlier['id'], salts=earlier['salts'] + entry['salts'])
+        by_key[key] = entry
+
+    refs = [('key', key) for key in by_key] + [('id', entry['id']) for entry in by_key.values() if entry['id']]
+    found = _resolve_products(connection, refs)
+
+    inserts, updates, product_salts = [], [], []
+    for key, entry in by_key.items():
+        product_id = found.get(('id', entry['id'])) or found.get(('key', key))
+        if product_id:
+            updates.append(dict(entry['values'], _id=product_id))
+        else:
+            product_id = entry['id'] or generate_uuid()
+            inserts.append(dict(entry['values'], id=product_id))
+        product_salts += [(product_id, salt['values']) for salt in entry['salts']]
+
+    _upsert(connection, products, inserts, updates)
+    if product_salts:
+        _upsert_salts(connection, product_salts)
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+
+
+def _with_product_ids(connection, chunk, report):
+    found = _resolve_products(connection, {entry['product'] for _, entry in chunk})
+    resolved = []
+    for line, entry in chunk:
+        product_id = found.get(entry['product'])
+        if product_id is None:
+            report.reject(line, InvalidRow(f'Unknown product {entry["product"][1]}'))
+        else:
+            resolved.append((product_id, entry['values']))
+    return resolved
+
+
+def _write_salts(connection, chunk, report):
+    entries = _with_product_ids(connection, chunk, report)
+    if entries:
+        inserted, updated = _upsert_salts(connection, entries)
+        report.inserted += inserted
+        report.updated += updated
+
+
+def _write_reviews(connection, chunk, report):
+    """Upsert reviews keyed by product and reviewer name"""
+    entries = _with_product_ids(connection, chunk, report)
+    if not entries:
+        return
+    existing = {}
+    rows = connection.execute(
+        select(reviews.c.id, reviews.c.product_id, reviews.c.user_name).where(
+            reviews.c.product_id.in_({product_id for product_id, _ in entries})
+        )
+    )
+    for row in rows:
+        existing[(row.product_id, row.user_name)] = row.id
+
+    inserts, updates = {}, {}
+    for product_id, values in entries:
+        key = (product_id, values['user_name'])
+        if key in existing:
+            updates[key] = dict(values, _id=existing[key])
+        else:
+            inserts[key] = dict(values, id=generate_uuid(), product_id=product_id)
+    _upsert(connection, reviews, list(inserts.values()), list(updates.values()))
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+
+
+WRITERS = {
+    'products': _write_products,
+    'salts': _write_salts,
+    'reviews': _write_reviews,
+}
+
+
+def refresh_derived_data(kinds):
+    """
+    Bring everything computed from catalog rows back in step after an import.
+
+    Bulk writes bypass the ORM, so neither the rating summary hooks nor the
+    change listeners saw them: summaries and ``avg_rating`` are rebuilt in one
+    pass, the in-memory indexes of this process rebuild on next use, and the
+    response cache generations are bumped.
+    """
+    if {'products', 'reviews'} & set(kinds):
+        with db.engine.begin() as connection:
+            rebuild_summaries(connection)
+    for name in ('search', 'facets', 'substitutes'):
+        current_app.extensions[name].invalidate()
+    cache = current_app.extensions['response_cache']
+    for model in (Product, Salt, Review):
+        cache.bump_generation(model.__name__)
+
+
+def import_rows(kind, rows, chunk_size=1000, progress=None, refresh=True):
+    """
+    Validate and upsert ``(line, row)`` pairs of ``kind``, ``chunk_size`` at a time.
+
+    Every chunk is written with executemany statements in its own transaction.
+    Products are keyed by brand and name (or by ``id`` when the row carries an
+    existing one), salts by product and salt name, and reviews by product and
+    reviewer. Salts and reviews name their product by ``product_id`` or by
+    ``product_brand`` and ``product_name``. Invalid rows are skipped and
+    reported. ``progress`` is called with the report after each chunk.
+    """
+    if kind not in VALIDATORS:
+        raise InvalidImport(f'Unknown import kind: {kind}')
+    validate, write = VALIDATORS[kind], WRITERS[kind]
+    report = ImportReport(kind)
+    rows = iter(rows)
+
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            break
+        report.read += len(batch)
+        chunk = []
+        for line, row in batch:
+            try:
+                if isinstance(row, InvalidRow):
+                    raise row
+                chunk.append((line, validate(row)))
+            except (ValueError, TypeError) as e:
+                report.reject(line, e)
+        if chunk:
+            with db.engine.begin() as connection:
+                write(connection, chunk, report)
+        if progress:
+            progress(report)
+
+    if refresh:
+        refresh_derived_data([kind])
+    return report
+
+
+def import_file(kind, path, file_format=None, chunk_size=1000, progress=None, refresh=True):
+    """Import a CSV or NDJSON file (optionally gzipped, ``-`` for stdin)"""
+    file_format = file_format or detect_format(path)
+    with open_source(path) as stream:
+        return import_rows(kind, read_rows(stream, file_format), chunk_size, progress, refresh)
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(IMPORT_KINDS))
+@click.argument('path')
+@click.option('--format', 'file_format', type=click.Choice(IMPORT_FORMATS),
+              help='File format; detected from the extension by default.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows validated and written per transaction.')
+@with_appcontext
+def import_command(kind, path, file_format, chunk_size):
+    """Bulk upsert products, salts or reviews from a CSV or NDJSON file."""
+    try:
+        report = import_file(
+            kind, path, file_format, chunk_size,
+            progress=lambda report: click.echo(report.summary(), err=True)
+        )
+    except (InvalidImport, OSError) as e:
+        raise click.ClickException(str(e))
+
+    for line, message in report.errors:
+        click.echo(f'line {line}: {message}', err=True)
+    if report.invalid > len(report.errors):
+        click.echo(f'... and {report.invalid - len(report.errors)} more invalid rows', err=True)
+    click.echo(f'Done in {report.elapsed:.1f}s. {report.summary()}')
+    if report.invalid:
+        raise SystemExit(1)
+
+
+def init_importer(app):
+    app.cli.add_command(import_command)
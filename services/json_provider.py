@@ -0,0 +1,84 @@
+import time
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+from services.metrics import record_serialize_time
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """
+    Flask's default provider, except dates and datetimes encode as ISO 8601.
+
+    Serializers can then hand datetimes over untouched instead of calling
+    ``isoformat()`` per row, and every provider produces identical output.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_serialize_time(time.perf_counter() - started)
+
+
+class OrjsonJSONProvider(StdlibJSONProvider):
+    """Encodes with orjson, writing response bodies as bytes without a str round trip"""
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj):
+        started = time.perf_counter()
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options())
+        finally:
+            record_serialize_time(time.perf_counter() - started)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:  # encoder arguments only the stdlib understands
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def create_provider(app):
+    name = app.config.get('JSON_PROVIDER', 'auto')
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name == 'orjson':
+        if orjson is None:
+            raise RuntimeError('JSON_PROVIDER=orjson requires the orjson package')
+        return OrjsonJSONProvider(app)
+    if name == 'stdlib':
+        return StdlibJSONProvider(app)
+    raise ValueError(f'Unknown JSON_PROVIDER: {name}')
+
+
+def init_json(app):
+    app.json = create_provider(app)
+    return app.json
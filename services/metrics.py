@@ -0,0 +1,189 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# Statement text shown in slow-query and N+1 log lines
+MAX_LOGGED_STATEMENT = 500
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class MetricsRegistry:
+    """
+    Request metrics per (method, endpoint, status), rendered in the Prometheus text format.
+
+    Kept in process memory; with several workers each reports its own series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}  # labels -> {name: Histogram}
+        self._counters = {}  # (name, labels) -> value
+
+    def observe_request(self, labels, duration, queries, db_time, serialize_time, size):
+        with self._lock:
+            series = self._requests.get(labels)
+            if series is None:
+                series = self._requests[labels] = {
+                    'http_request_duration_seconds': Histogram(DURATION_BUCKETS),
+                    'http_request_db_queries': Histogram(QUERY_COUNT_BUCKETS),
+                    'http_request_db_seconds': Histogram(DURATION_BUCKETS),
+                    'http_request_serialize_seconds': Histogram(DURATION_BUCKETS),
+                }
+                self._counters[('http_response_bytes_total', labels)] = 0
+            series['http_request_duration_seconds'].observe(duration)
+            series['http_request_db_queries'].observe(queries)
+            series['http_request_db_seconds'].observe(db_time)
+            series['http_request_serialize_seconds'].observe(serialize_time)
+            self._counters[('http_response_bytes_total', labels)] += size or 0
+
+    def increment(self, name, labels):
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + 1
+
+    def render(self, gauges=(), histograms=()):
+        """
+        Prometheus exposition text.
+
+        ``gauges`` adds ``(name, labels, value)`` samples and ``histograms``
+        adds ``(name, labels, Histogram)`` series kept outside the registry.
+        """
+        lines = []
+        with self._lock:
+            for labels, series in sorted(self._requests.items()):
+                for name, histogram in series.items():
+                    _render_histogram(lines, name, labels, histogram)
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f'{name}{_labels(labels)} {value}')
+        for name, labels, histogram in histograms:
+            _render_histogram(lines, name, labels, histogram)
+        for name, labels, value in gauges:
+            lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _render_histogram(lines, name, labels, histogram):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {histogram.count}')
+    lines.append(f'{name}_sum{_labels(labels)} {histogram.sum:.6f}')
+    lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + [(key, value) for key, value in extra.items()]
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def record_serialize_time(elapsed):
+    """Add JSON encoding time to the current request's serialization time"""
+    if has_request_context() and 'instrumentation' in g:
+        g.instrumentation['serialize_time'] += elapsed
+
+
+# SQLAlchemy hooks; registered once on the Engine class and active only inside instrumented requests.
+# The start time lives on the execution context, so a statement that raises leaves nothing behind.
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is None or not has_request_context() or 'instrumentation' not in g:
+        return
+    elapsed = time.perf_counter() - started
+    stats = g.instrumentation
+    stats['queries'] += 1
+    stats['db_time'] += elapsed
+    stats['statements'][statement] = stats['statements'].get(statement, 0) + 1
+
+    slow_ms = current_app.config['SLOW_QUERY_MS']
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        current_app.extensions['metrics'].increment('db_slow_queries_total', (('endpoint', _endpoint()),))
+        current_app.logger.warning(
+            'Slow query (%.1f ms) in %s %s: %s', elapsed * 1000, request.method, _endpoint(),
+            statement[:MAX_LOGGED_STATEMENT]
+        )
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _start_request():
+    g.instrumentation = {
+        'started': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'serialize_time': 0.0, 'statements': {}
+    }
+
+
+def _finish_request(response):
+    stats = g.pop('instrumentation', None)
+    if stats is None:
+        return response
+    duration = time.perf_counter() - stats['started']
+    endpoint = _endpoint()
+    size = None if response.is_streamed else response.content_length
+
+    metrics = current_app.extensions['metrics']
+    labels = (('method', request.method), ('endpoint', endpoint), ('status', str(response.status_code)))
+    metrics.observe_request(labels, duration, stats['queries'], stats['db_time'], stats['serialize_time'], size)
+
+    threshold = current_app.config['N_PLUS_ONE_THRESHOLD']
+    for statement, count in stats['statements'].items():
+        if threshold and count >= threshold:
+            metrics.increment('db_repeated_statements_total', (('endpoint', endpoint),))
+            current_app.logger.warning(
+                'Possible N+1 in %s %s: statement ran %d times: %s', request.method, endpoint, count,
+                statement[:MAX_LOGGED_STATEMENT]
+            )
+
+    if current_app.config['SERVER_TIMING'] and not response.is_streamed:
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={stats["db_time"] * 1000:.2f};desc="{stats["queries"]} queries"',
+            f'serialize;dur={stats["serialize_time"] * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}'
+        ])
+    return response
+
+
+def init_metrics(app):
+    """Per-request query count, DB and serialization time, Server-Timing headers and slow-query logs"""
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    return registry
+
+
+def get_metrics():
+    return current_app.extensions['metrics']
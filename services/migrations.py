@@ -0,0 +1,326 @@
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Column, DateTime, MetaData, String, Table, column, func, inspect, select, table, type_coerce
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.types import NullType
+from werkzeug.datastructures import MultiDict
+
+from models import db, CatalogDeletion, Product, ProductRatingSummary, RevokedToken, Salt, Review
+from services.ids import UUIDKey, get_id_storage
+from services.ratings import rebuild_summaries
+
+# Kept out of db.metadata so create_all never marks migrations as applied
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', String(20), primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def _add_column(connection, table, column_name):
+    """Add a column declared on the model if the live table lacks it"""
+    existing = {column['name'] for column in inspect(connection).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column = table.c[column_name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+
+
+def _create_indexes(connection, table, *names):
+    """Create model-declared indexes on ``table`` that the database does not have yet"""
+    existing = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in names and index.name not in existing:
+            index.create(connection)
+
+
+def _0001_normalized_brand_category(connection):
+    _add_column(connection, Product.__table__, 'brand_normalized')
+    _add_column(connection, Product.__table__, 'category_normalized')
+    # Lightweight table: the model's ``updated_at`` onupdate would reference a column added in 0003
+    products = table(
+        'products', column('brand'), column('category'), column('brand_normalized'), column('category_normalized')
+    )
+    connection.execute(products.update().values(
+        brand_normalized=func.lower(func.trim(products.c.brand)),
+        category_normalized=func.lower(func.trim(products.c.category))
+    ))
+
+
+def _0002_listing_indexes(connection):
+    _create_indexes(
+        connection, Product.__table__,
+        'ix_products_created_at_id', 'ix_products_price',
+        'ix_products_brand_normalized_price', 'ix_products_category_normalized_price'
+    )
+    _create_indexes(
+        connection, Salt.__table__,
+        'ix_salts_product_id_created_at', 'ix_salts_created_at_id'
+    )
+    _create_indexes(
+        connection, Review.__table__,
+        'ix_reviews_product_id_created_at_id', 'ix_reviews_created_at_id'
+    )
+
+
+def _0003_product_updated_at(connection):
+    products = Product.__table__
+    _add_column(connection, products, 'updated_at')
+    connection.execute(
+        products.update().where(products.c.updated_at.is_(None)).values(updated_at=products.c.created_at)
+    )
+    _create_indexes(connection, products, 'ix_products_updated_at')
+
+
+def _0004_sort_indexes(connection):
+    _create_indexes(
+        connection, Product.__table__,
+        'ix_products_avg_rating', 'ix_products_name',
+        'ix_products_brand_normalized_avg_rating', 'ix_products_category_normalized_avg_rating'
+    )
+
+
+def _0005_catalog_change_markers(connection):
+    salts = Salt.__table__
+    _add_column(connection, salts, 'updated_at')
+    connection.execute(salts.update().where(salts.c.updated_at.is_(None)).values(updated_at=salts.c.created_at))
+    _create_indexes(connection, salts, 'ix_salts_updated_at')
+    CatalogDeletion.__table__.create(connection, checkfirst=True)
+
+
+def _0006_rating_summaries(connection):
+    ProductRatingSummary.__table__.create(connection, checkfirst=True)
+    rebuild_summaries(connection)
+
+
+def _0007_revoked_tokens(connection):
+    RevokedToken.__table__.create(connection, checkfirst=True)
+
+
+# Ordered list of (version, description, upgrade function). Every function
+# must be safe to run against a schema that db.create_all() already built.
+MIGRATIONS = [
+    ('0001', 'Normalized brand/category columns', _0001_normalized_brand_category),
+    ('0002', 'Indexes for product, salt and review listings', _0002_listing_indexes),
+    ('0003', 'Product updated_at for incremental exports', _0003_product_updated_at),
+    ('0004', 'Indexes for price, rating and name sorted listings', _0004_sort_indexes),
+    ('0005', 'Salt updated_at and deletion tombstones for catalog change checks', _0005_catalog_change_markers),
+    ('0006', 'Per-product rating summaries, built from existing reviews', _0006_rating_summaries),
+    ('0007', 'Revoked token list for refresh token rotation and logout', _0007_revoked_tokens),
+]
+
+
+def applied_versions(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine):
+    """Apply pending migrations in order, each in its own transaction"""
+    with engine.begin() as connection:
+        applied = applied_versions(connection)
+
+    ran = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        ran.append((version, description))
+    return ran
+
+
+# Switching UUID key storage between VARCHAR(36) and 16-byte binary
+
+def _stored_as_binary(connection, table):
+    key = next(iter(table.primary_key.columns)).name
+    column = next(column for column in inspect(connection).get_columns(table.name) if column['name'] == key)
+    return not isinstance(column['type'], String)
+
+
+def id_tables_to_convert(connection):
+    """Existing tables with UUID keys whose storage differs from ID_STORAGE, parents first"""
+    binary = get_id_storage() == 'binary'
+    existing = set(inspect(connection).get_table_names())
+    return [
+        table for table in db.metadata.sorted_tables
+        if table.name in existing
+        and any(isinstance(column.type, UUIDKey) for column in table.columns)
+        and _stored_as_binary(connection, table) != binary
+    ]
+
+
+def _drop_indexes(connection, table):
+    """Drop the model's named indexes so the recreated table can reuse the names"""
+    if connection.dialect.name == 'mysql':
+        return  # index names are per table, and FK-backing indexes cannot be dropped
+    existing = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in existing:
+            index.drop(connection)
+
+
+def _copy_rows(connection, source, target, chunk_size):
+    key = next(iter(source.primary_key.columns))
+    copied = 0
+    last = None
+    while True:
+        query = select(source).order_by(key).limit(chunk_size)
+        if last is not None:
+            query = query.where(key > last)
+        rows = connection.execute(query).mappings().all()
+        if not rows:
+            return copied
+        connection.execute(target.insert(), [dict(row) for row in rows])
+        copied += len(rows)
+        last = rows[-1][key.name]
+
+
+def convert_id_storage(engine, chunk_size=1000):
+    """
+    Rewrite every UUID key and foreign key column into the configured storage.
+
+    Each affected table is renamed aside, recreated from the models and
+    copied over in primary-key chunks (the column type converts each value),
+    then the old copies are dropped children first. Supports MySQL and SQLite;
+    MySQL commits DDL implicitly, so take a backup and stop the app first.
+    """
+    copied = []
+    with engine.begin() as connection:
+        tables = id_tables_to_convert(connection)
+        for table in tables:
+            _drop_indexes(connection, table)
+            connection.exec_driver_sql(f'ALTER TABLE {table.name} RENAME TO {table.name}_old_ids')
+        db.metadata.create_all(connection, tables=tables)
+        old_tables = []
+        for table in tables:
+            old = Table(f'{table.name}_old_ids', MetaData(), autoload_with=connection)
+            copied.append((table.name, _copy_rows(connection, old, table, chunk_size)))
+            old_tables.append(old)
+        for old in reversed(old_tables):
+            old.drop(connection)
+    return copied
+
+
+# EXPLAIN support for the index check
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kwargs):
+    return 'EXPLAIN ' + compiler.process(element.statement, **kwargs)
+
+
+@compiles(Explain, 'sqlite')
+def _compile_explain_sqlite(element, compiler, **kwargs):
+    return 'EXPLAIN QUERY PLAN ' + compiler.process(element.statement, **kwargs)
+
+
+def listing_queries():
+    """Representative listing queries, built the same way the routes build them"""
+    from routes.products import filter_products
+
+    def products(**args):
+        query = filter_products(Product.query, MultiDict(args))
+        return query.order_by(Product.created_at.desc(), Product.id.desc()).limit(20)
+
+    return {
+        'products newest first': products(),
+        'products by brand': products(brand='sample'),
+        'products by category': products(category='sample'),
+        'products by price range': Product.query.filter(Product.price.between(10, 20)).limit(20),
+        'reviews newest first': Review.query.order_by(Review.created_at.desc(), Review.id.desc()).limit(20),
+        'reviews of a product': Review.query.filter_by(product_id='sample').order_by(
+            Review.created_at.desc(), Review.id.desc()
+        ).limit(20),
+        'salts of a product': Salt.query.filter_by(product_id='sample').order_by(Salt.created_at),
+    }
+
+
+def full_scans(connection, query):
+    """Tables the database plans to read in full for ``query``"""
+    # Untyped columns, so the SELECT's result processors (UUIDKey) are not applied to EXPLAIN's rows
+    statement = query.statement.with_only_columns(
+        *(type_coerce(column, NullType()) for column in query.statement.selected_columns)
+    )
+    rows = connection.execute(Explain(statement)).mappings().all()
+    if connection.dialect.name == 'sqlite':
+        return [
+            row['detail'] for row in rows
+            if row['detail'].startswith('SCAN ') and ' USING ' not in row['detail']
+        ]
+    return [row['table'] for row in rows if row.get('type') == 'ALL']
+
+
+@click.group('schema')
+def schema_cli():
+    """Manage database schema migrations."""
+
+
+@schema_cli.command('upgrade')
+@with_appcontext
+def upgrade_command():
+    """Apply pending schema migrations."""
+    ran = upgrade(db.engine)
+    for version, description in ran:
+        click.echo(f'Applied {version}: {description}')
+    if not ran:
+        click.echo('Schema is up to date')
+
+
+@schema_cli.command('status')
+@with_appcontext
+def status_command():
+    """List migrations and whether they have been applied."""
+    with db.engine.begin() as connection:
+        applied = applied_versions(connection)
+    for version, description, _ in MIGRATIONS:
+        click.echo(f"[{'x' if version in applied else ' '}] {version}: {description}")
+
+
+@schema_cli.command('convert-ids')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows copied per statement.')
+@click.confirmation_option(prompt='This rewrites every table with UUID keys. Is the app stopped and the database backed up?')
+@with_appcontext
+def convert_ids_command(chunk_size):
+    """Rewrite UUID key columns into the configured ID_STORAGE format."""
+    with db.engine.connect() as connection:
+        if not id_tables_to_convert(connection):
+            click.echo(f'All tables already use {get_id_storage()} IDs')
+            return
+    for table, rows in convert_id_storage(db.engine, chunk_size):
+        click.echo(f'Converted {table}: {rows} rows')
+
+
+@schema_cli.command('check-indexes')
+@with_appcontext
+def check_indexes_command():
+    """EXPLAIN the listing queries and fail if any falls back to a full table scan."""
+    failures = 0
+    with db.engine.connect() as connection:
+        for name, query in listing_queries().items():
+            scans = full_scans(connection, query)
+            if scans:
+                failures += 1
+                click.echo(f"FULL SCAN  {name}: {', '.join(scans)}")
+            else:
+                click.echo(f'ok         {name}')
+    if failures:
+        raise SystemExit(1)
+
+
+def init_migrations(app):
+    app.cli.add_command(schema_cli)
@@ -0,0 +1,117 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, Integer, Numeric, and_, or_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidSort(ValueError):
+    pass
+
+
+class InvalidPageSize(ValueError):
+    pass
+
+
+MAX_PER_PAGE = 1000
+
+
+def parse_per_page(value, default):
+    """A ``per_page`` argument clamped to 1..MAX_PER_PAGE; ``default`` when it is not given"""
+    if value is None or value == '':
+        return default
+    try:
+        per_page = int(value)
+    except ValueError:
+        raise InvalidPageSize('per_page must be an integer')
+    return min(max(per_page, 1), MAX_PER_PAGE)
+
+
+def parse_sort(value, sorts):
+    """``(column, descending)`` for a ``sort`` parameter from ``sorts``, or None when not given"""
+    if not value:
+        return None
+    if value not in sorts:
+        raise InvalidSort(f"Unknown sort: {value}; use one of {', '.join(sorts)}")
+    return sorts[value]
+
+
+def encode_cursor(value, row_id):
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parse=datetime.fromisoformat):
+    """``(value, row_id)`` from a cursor, with ``parse`` applied to a non-null value"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (parse(value) if value is not None else None), str(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _value_parser(column):
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat
+    if isinstance(column.type, (Float, Integer, Numeric)):
+        return float
+    return str
+
+
+def _after(column, id_column, value, row_id, descending):
+    """Rows after ``(value, row_id)``; NULLs sort lowest, as in MySQL and SQLite"""
+    if descending:
+        if value is None:
+            return and_(column.is_(None), id_column < row_id)
+        return or_(
+            column < value,
+            column.is_(None),
+            and_(column == value, id_column < row_id)
+        )
+    if value is None:
+        return or_(column.isnot(None), and_(column.is_(None), id_column > row_id))
+    return or_(column > value, and_(column == value, id_column > row_id))
+
+
+def sort_columns(model, order):
+    """ORDER BY clauses for ``order`` = ``(column, descending)``, ties broken on id the same way"""
+    column, descending = order
+    if descending:
+        return column.desc(), model.id.desc()
+    return column.asc(), model.id.asc()
+
+
+def keyset_paginate(query, model, cursor, per_page, include_total=False, order=None):
+    """
+    Page through ``query`` using a (sort value, id) cursor.
+
+    ``order`` is ``(column, descending)`` and defaults to newest first by
+    ``created_at``. The next page is found with a WHERE clause on the last
+    row seen instead of an OFFSET, and the COUNT query only runs when
+    ``include_total`` is set. Returns the page items and the pagination
+    fields for the response.
+    """
+    column, descending = order or (model.created_at, True)
+    total = query.order_by(None).count() if include_total else None
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, _value_parser(column))
+        query = query.filter(_after(column, model.id, value, row_id, descending))
+
+    rows = query.order_by(*sort_columns(model, (column, descending))).limit(per_page + 1).all()
+    items = rows[:per_page]
+    has_next = len(rows) > per_page
+
+    meta = {
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': encode_cursor(getattr(items[-1], column.key), items[-1].id) if has_next else None
+    }
+    if include_total:
+        meta['total'] = total
+    return items, meta
@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# Werkzeug's defaults for a method given without parameters
+SCRYPT_DEFAULTS = (2 ** 15, 8, 1)
+
+
+def kdf_parameters(method):
+    """
+    Canonical ``(kdf, *parameters)`` for a Werkzeug method string.
+
+    ``pbkdf2``, ``pbkdf2:sha256`` and ``pbkdf2:sha256:<default iterations>``
+    all give the same tuple, as do ``scrypt`` and ``scrypt:32768:8:1``;
+    unparsable methods compare as plain strings.
+    """
+    kdf, *args = method.split(':')
+    try:
+        if kdf == 'scrypt':
+            return (kdf, *(tuple(map(int, args)) if args else SCRYPT_DEFAULTS))
+        if kdf == 'pbkdf2' and len(args) <= 2:
+            hash_name = args[0].lower() if args else 'sha256'
+            iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+            return kdf, hash_name, iterations
+    except ValueError:
+        pass
+    return (method,)
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool is saturated and the request should be retried"""
+
+
+class PasswordHasher:
+    """
+    Runs password KDFs on a small dedicated thread pool.
+
+    At most ``workers`` hashes run at once and at most ``queue_size`` more may
+    wait; further calls fail fast with HasherBusy instead of tying up request
+    threads, so a login burst cannot starve catalog traffic of CPU.
+    """
+
+    def __init__(self, method, workers=2, queue_size=16, timeout=10):
+        self.method = method
+        self._parameters = kdf_parameters(method)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Too many concurrent authentication requests')
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy('Timed out waiting for password hashing')
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when ``password_hash`` was made with different KDF parameters"""
+        return kdf_parameters(password_hash.split('$', 1)[0]) != self._parameters
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def init_passwords(app):
+    hasher = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        queue_size=app.config['PASSWORD_HASH_QUEUE_SIZE'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT']
+    )
+    app.extensions['password_hasher'] = hasher
+    return hasher
+
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
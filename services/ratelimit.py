@@ -0,0 +1,118 @@
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+_LIMIT_RE = re.compile(r'^\s*(\d+)\s*/\s*(second|minute|hour)\s*$')
+
+
+def parse_limit(value):
+    """``'60/minute'`` -> ``(capacity, tokens per second)``; None for an empty or ``0`` limit"""
+    if not value or value.strip() == '0':
+        return None
+    match = _LIMIT_RE.match(value)
+    if not match:
+        raise ValueError(f'Invalid rate limit: {value!r}; use e.g. 60/minute')
+    count = int(match.group(1))
+    return count, count / PERIODS[match.group(2)]
+
+
+class MemoryRateLimiter:
+    """
+    Token buckets per (limit, client) in process memory.
+
+    A bucket holds up to ``capacity`` tokens and refills continuously, so
+    clients get short bursts but not more than the configured average rate.
+    With several workers each enforces the limit separately. The least
+    recently used buckets are dropped beyond ``max_clients``; a dropped
+    bucket comes back full.
+    """
+
+    def __init__(self, max_clients=10000):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def hit(self, key, capacity, rate):
+        """Take one token; returns ``(allowed, seconds until a token is available)``"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(capacity), now]
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0.0
+            return False, (1 - bucket[0]) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+def client_identity():
+    """JWT identity when the request carries a valid token, else the client address"""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    if identity:
+        return f'user:{identity}'
+    return f'ip:{request.remote_addr}'
+
+
+def rate_limit(name, when=None):
+    """
+    Limit a view with the ``<NAME>_RATE_LIMIT`` bucket, optionally only for requests where ``when()`` holds.
+
+    Requests over the limit get a 429 with ``Retry-After``.
+    """
+    setting = f'{name.upper()}_RATE_LIMIT'
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limiter')
+            limit = current_app.extensions.get('rate_limits', {}).get(setting)
+            if limiter is None or limit is None or (when is not None and not when()):
+                return view(*args, **kwargs)
+
+            allowed, retry_after = limiter.hit((name, client_identity()), *limit)
+            if not allowed:
+                current_app.extensions['metrics'].increment('http_rate_limited_total', (('limit', name),))
+                return jsonify({'error': 'Too many requests'}), 429, {'Retry-After': str(math.ceil(retry_after))}
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def init_rate_limits(app):
+    """Parse the *_RATE_LIMIT settings and create the limiter (RATE_LIMIT_BACKEND=none disables it)"""
+    backend = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+    if backend == 'none':
+        app.extensions['rate_limiter'] = None
+        return None
+    if backend != 'memory':
+        raise ValueError(f'Unknown RATE_LIMIT_BACKEND: {backend}')
+    app.extensions['rate_limits'] = {
+        key: parse_limit(value) for key, value in app.config.items() if key.endswith('_RATE_LIMIT')
+    }
+    limiter = MemoryRateLimiter(max_clients=app.config.get('RATE_LIMIT_MAX_CLIENTS', 10000))
+    app.extensions['rate_limiter'] = limiter
+    return limiter
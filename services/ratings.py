@@ -0,0 +1,178 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Float, case, cast, event, func, inspect, select
+
+from models import db, Product, ProductRatingSummary, Review
+
+summaries = ProductRatingSummary.__table__
+products = Product.__table__
+reviews = Review.__table__
+
+RATING_COLUMNS = {i: f'rating_{i}' for i in range(1, 6)}
+
+
+def _average_of(summary):
+    return case(
+        (summary.c.rating_count > 0, cast(summary.c.rating_sum, Float) / summary.c.rating_count),
+        else_=0.0
+    )
+
+
+# Derived-data updates keep ``updated_at`` as is (it would otherwise fire ``onupdate``), so a
+# rating change does not make a product look edited to incremental exports and warm starts
+
+def _sync_avg_rating(connection, product_id):
+    average = select(_average_of(summaries)).where(
+        summaries.c.product_id == product_id
+    ).scalar_subquery()
+    connection.execute(
+        products.update().where(products.c.id == product_id).values(
+            avg_rating=func.coalesce(average, 0.0), updated_at=products.c.updated_at
+        )
+    )
+
+
+def _aggregate_reviews():
+    """SELECT computing every summary column per product from the reviews table"""
+    rating_counts = [
+        func.coalesce(func.sum(case((reviews.c.rating == rating, 1), else_=0)), 0).label(column)
+        for rating, column in RATING_COLUMNS.items()
+    ]
+    return select(
+        products.c.id.label('product_id'),
+        func.count(reviews.c.id).label('rating_count'),
+        func.coalesce(func.sum(reviews.c.rating), 0).label('rating_sum'),
+        *rating_counts
+    ).select_from(
+        products.outerjoin(reviews, reviews.c.product_id == products.c.id)
+    ).group_by(products.c.id)
+
+
+def _summary_columns():
+    return ['product_id', 'rating_count', 'rating_sum', *RATING_COLUMNS.values()]
+
+
+def compute_summary(product_id):
+    """
+    Aggregate one product's reviews into an unsaved summary.
+
+    Used for products whose summary row has not been built yet; returns
+    ``None`` when the product does not exist.
+    """
+    row = db.session.execute(_aggregate_reviews().where(products.c.id == product_id)).first()
+    return ProductRatingSummary(**row._mapping) if row else None
+
+
+def load_summaries(product_ids):
+    """
+    Fetch the summaries of many products, keyed by product ID.
+
+    Stored rows come from one ``IN`` lookup; products without a stored row are
+    aggregated together in one grouped query. Unknown products are left out.
+    """
+    found = {
+        summary.product_id: summary
+        for summary in ProductRatingSummary.query.filter(ProductRatingSummary.product_id.in_(product_ids))
+    }
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    if missing:
+        for row in db.session.execute(_aggregate_reviews().where(products.c.id.in_(missing))):
+            found[row.product_id] = ProductRatingSummary(**row._mapping)
+    return found
+
+
+def recompute_summary(connection, product_id):
+    """Rebuild one product's summary row from its reviews"""
+    connection.execute(summaries.delete().where(summaries.c.product_id == product_id))
+    connection.execute(
+        summaries.insert().from_select(
+            _summary_columns(), _aggregate_reviews().where(products.c.id == product_id)
+        )
+    )
+    _sync_avg_rating(connection, product_id)
+
+
+def apply_rating_delta(connection, product_id, rating, delta):
+    """Add (``delta=1``) or remove (``delta=-1``) one rating from a summary"""
+    values = {
+        'rating_count': summaries.c.rating_count + delta,
+        'rating_sum': summaries.c.rating_sum + delta * rating,
+    }
+    column = RATING_COLUMNS.get(rating)
+    if column:
+        values[column] = summaries.c[column] + delta
+
+    result = connection.execute(
+        summaries.update().where(summaries.c.product_id == product_id).values(**values)
+    )
+    if result.rowcount == 0:
+        # Product predates the summary table; the reviews already reflect this change
+        recompute_summary(connection, product_id)
+    else:
+        _sync_avg_rating(connection, product_id)
+
+
+def rebuild_summaries(connection):
+    """Recompute every summary row and ``Product.avg_rating`` from scratch"""
+    connection.execute(summaries.delete())
+    connection.execute(summaries.insert().from_select(_summary_columns(), _aggregate_reviews()))
+    average = select(_average_of(summaries)).where(
+        summaries.c.product_id == products.c.id
+    ).scalar_subquery()
+    connection.execute(products.update().values(
+        avg_rating=func.coalesce(average, 0.0), updated_at=products.c.updated_at
+    ))
+
+
+def _review_inserted(mapper, connection, target):
+    apply_rating_delta(connection, target.product_id, target.rating, 1)
+
+
+def _review_deleted(mapper, connection, target):
+    apply_rating_delta(connection, target.product_id, target.rating, -1)
+
+
+def _review_updated(mapper, connection, target):
+    state = inspect(target)
+    rating = state.attrs.rating.history
+    product_id = state.attrs.product_id.history
+    if not rating.deleted and not product_id.deleted:
+        return
+    old_rating = rating.deleted[0] if rating.deleted else target.rating
+    old_product_id = product_id.deleted[0] if product_id.deleted else target.product_id
+    apply_rating_delta(connection, old_product_id, old_rating, -1)
+    apply_rating_delta(connection, target.product_id, target.rating, 1)
+
+
+def _product_inserted(mapper, connection, target):
+    connection.execute(summaries.insert().values(product_id=target.id))
+
+
+def _product_deleting(mapper, connection, target):
+    connection.execute(summaries.delete().where(summaries.c.product_id == target.id))
+
+
+_MAPPER_HOOKS = [
+    (Review, 'after_insert', _review_inserted),
+    (Review, 'after_delete', _review_deleted),
+    (Review, 'after_update', _review_updated),
+    (Product, 'after_insert', _product_inserted),
+    (Product, 'before_delete', _product_deleting),
+]
+
+
+@click.command('rebuild-ratings')
+@with_appcontext
+def rebuild_ratings_command():
+    """Recompute review aggregates and average ratings for all products."""
+    with db.engine.begin() as connection:
+        rebuild_summaries(connection)
+    click.echo('Rating summaries rebuilt')
+
+
+def init_ratings(app):
+    """Keep rating summaries current on review writes and add the rebuild command"""
+    for model, name, hook in _MAPPER_HOOKS:
+        if not event.contains(model, name, hook):
+            event.listen(model, name, hook)
+    app.cli.add_command(rebuild_ratings_command)
@@ -0,0 +1,321 @@
+import re
+import threading
+from bisect import bisect_left, insort
+
+from flask import current_app
+from sqlalchemy import case, false, or_
+
+from models import db, Product, Salt
+from services.changes import register_listener
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Relative importance of a match in each indexed field
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'brand': 2.0,
+    'generic_name': 2.0,
+    'salt': 1.5,
+}
+
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+FUZZY_SCORE = 0.6
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchEngine:
+    """Base class for product search backends.
+
+    A backend narrows a ``Product`` query down to the rows matching ``term``
+    and orders them by relevance.
+    """
+
+    def filter_query(self, query, term, restrict_to=None, exclude_id=None):
+        """
+        ``restrict_to`` optionally holds the IDs the listing's other filters
+        allow, and ``exclude_id`` a product the listing leaves out.
+        """
+        raise NotImplementedError
+
+    def rebuild(self, products=None, salts=None):
+        pass
+
+    def apply_changes(self, changes):
+        pass
+
+    def invalidate(self):
+        pass
+
+
+class LikeSearchEngine(SearchEngine):
+    """Plain SQL ``ILIKE`` search, kept for small databases and debugging"""
+
+    def filter_query(self, query, term, restrict_to=None, exclude_id=None):
+        return query.filter(
+            or_(
+                Product.name.ilike(f'%{term}%'),
+                Product.generic_name.ilike(f'%{term}%'),
+                Product.brand.ilike(f'%{term}%')
+            )
+        )
+
+
+class InMemorySearchEngine(SearchEngine):
+    """Inverted token index with prefix, trigram typo matching and ranking.
+
+    The index covers product name, brand, generic name and salt names. It is
+    built from the database on first use and then kept current from committed
+    session changes, so a search never scans the ``products`` table.
+    """
+
+    def __init__(self, max_results=1000, fuzzy_threshold=0.4, max_expansions=50):
+        self.max_results = max_results
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_expansions = max_expansions
+        self._lock = threading.RLock()
+        self._built = False
+        self._reset()
+
+    def _reset(self):
+        self._products = {}  # product_id -> {field: text}
+        self._salts = {}  # salt_id -> (product_id, salt_name)
+        self._product_salts = {}  # product_id -> set(salt_id)
+        self._doc_tokens = {}  # product_id -> {token: weight}
+        self._postings = {}  # token -> {product_id: weight}
+        self._sorted_tokens = []
+        self._trigrams = {}  # trigram -> set(token)
+
+    # Index maintenance
+
+    def rebuild(self, products=None, salts=None):
+        """Build from the database, or from ``products``/``salts`` rows (a warm-start snapshot)"""
+        with self._lock:
+            self._reset()
+            if products is None:
+                products = db.session.query(
+                    Product.id, Product.name, Product.brand, Product.generic_name
+                ).yield_per(1000)
+            for row in products:
+                self._products[row.id] = {
+                    'name': row.name, 'brand': row.brand, 'generic_name': row.generic_name
+                }
+            if salts is None:
+                salts = db.session.query(Salt.id, Salt.product_id, Salt.salt_name).yield_per(1000)
+            for row in salts:
+                self._salts[row.id] = (row.product_id, row.salt_name)
+                self._product_salts.setdefault(row.product_id, set()).add(row.id)
+            for product_id in self._products:
+                self._index(product_id)
+            self._built = True
+
+    def invalidate(self):
+        """Rebuild on next use, after writes that bypassed the ORM session"""
+        with self._lock:
+            self._built = False
+            self._reset()
+
+    def ensure_built(self):
+        if not self._built:
+            self.rebuild()
+
+    def apply_changes(self, changes):
+        if not changes.touches(Product, Salt):
+            return
+        with self._lock:
+            if not self._built:
+                return
+            touched = set()
+            for row in changes.deleted(Product):
+                self._unindex(row['id'])
+                self._products.pop(row['id'], None)
+                for salt_id in self._product_salts.pop(row['id'], set()):
+                    self._salts.pop(salt_id, None)
+            for row in changes.upserted(Product):
+                self._products[row['id']] = {
+                    'name': row['name'], 'brand': row['brand'], 'generic_name': row['generic_name']
+                }
+                touched.add(row['id'])
+            for row in changes.deleted(Salt):
+                old = self._salts.pop(row['id'], None)
+                if old:
+                    self._product_salts.get(old[0], set()).discard(row['id'])
+                    touched.add(old[0])
+            for row in changes.upserted(Salt):
+                old = self._salts.get(row['id'])
+                if old and old[0] != row['product_id']:
+                    self._product_salts.get(old[0], set()).discard(row['id'])
+                    touched.add(old[0])
+                self._salts[row['id']] = (row['product_id'], row['salt_name'])
+                self._product_salts.setdefault(row['product_id'], set()).add(row['id'])
+                touched.add(row['product_id'])
+            for product_id in touched:
+                self._unindex(product_id)
+                if product_id in self._products:
+                    self._index(product_id)
+
+    def _index(self, product_id):
+        fields = self._products[product_id]
+        weights = {}
+        for field in ('name', 'brand', 'generic_name'):
+            for token in tokenize(fields.get(field)):
+                weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS[field])
+        for salt_id in self._product_salts.get(product_id, ()):
+            for token in tokenize(self._salts[salt_id][1]):
+                weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS['salt'])
+
+        self._doc_tokens[product_id] = weights
+        for token, weight in weights.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                insort(self._sorted_tokens, token)
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            posting[product_id] = weight
+
+    def _unindex(self, product_id):
+        for token in self._doc_tokens.pop(product_id, {}):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(product_id, None)
+            if not posting:
+                del self._postings[token]
+                del self._sorted_tokens[bisect_left(self._sorted_tokens, token)]
+                for gram in trigrams(token):
+                    grams = self._trigrams.get(gram)
+                    if grams is not None:
+                        grams.discard(token)
+                        if not grams:
+                            del self._trigrams[gram]
+
+    # Querying
+
+    def search(self, term, restrict_to=None, capped=True, exclude_id=None):
+        """
+        Return product IDs matching every word of ``term``, best first.
+
+        Only IDs in ``restrict_to`` are kept when it is given, and
+        ``exclude_id`` is dropped, before the ranking is cut to
+        ``max_results`` (unless ``capped`` is False).
+        """
+        query_tokens = tokenize(term)
+        if not query_tokens:
+            return []
+
+        with self._lock:
+            self.ensure_built()
+            scores = None
+            for query_token in query_tokens:
+                matches = self._match_token(query_token)
+                if scores is None:
+                    scores = matches
+                    if restrict_to is not None:
+                        scores = {
+                            product_id: score for product_id, score in scores.items() if product_id in restrict_to
+                        }
+                else:
+                    scores = {
+                        product_id: score + matches[product_id]
+                        for product_id, score in scores.items()
+                        if product_id in matches
+                    }
+                if not scores:
+                    return []
+            scores.pop(exclude_id, None)
+
+            ranked = sorted(
+                scores.items(),
+                key=lambda item: (-item[1], self._products[item[0]]['name'] or '', item[0])
+            )
+        if capped:
+            ranked = ranked[:self.max_results]
+        return [product_id for product_id, _ in ranked]
+
+    def _match_token(self, query_token):
+        matches = {}
+
+        def add(token, factor):
+            for product_id, weight in self._postings[token].items():
+                score = weight * factor
+                if score > matches.get(product_id, 0):
+                    matches[product_id] = score
+
+        if query_token in self._postings:
+            add(query_token, EXACT_SCORE)
+
+        start = bisect_left(self._sorted_tokens, query_token)
+        expansions = 0
+        # Walk by index: a slice would copy the rest of the vocabulary for every query token
+        for position in range(start, len(self._sorted_tokens)):
+            token = self._sorted_tokens[position]
+            if not token.startswith(query_token) or expansions >= self.max_expansions:
+                break
+            if token != query_token:
+                add(token, PREFIX_SCORE)
+                expansions += 1
+
+        if not matches and len(query_token) >= 3:
+            for token, similarity in self._similar_tokens(query_token):
+                add(token, FUZZY_SCORE * similarity)
+
+        return matches
+
+    def _similar_tokens(self, query_token):
+        query_grams = trigrams(query_token)
+        shared = {}
+        for gram in query_grams:
+            for token in self._trigrams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+
+        similar = []
+        for token, count in shared.items():
+            similarity = count / (len(query_grams) + len(trigrams(token)) - count)
+            if similarity >= self.fuzzy_threshold:
+                similar.append((token, similarity))
+        similar.sort(key=lambda item: -item[1])
+        return similar[:self.max_expansions]
+
+    def filter_query(self, query, term, restrict_to=None, exclude_id=None):
+        product_ids = self.search(term, restrict_to, exclude_id=exclude_id)
+        if not product_ids:
+            return query.filter(false())
+        # Typed comparisons, so the IDs bind through UUIDKey like the IN list (binary ID storage)
+        return query.filter(Product.id.in_(product_ids)).order_by(
+            case(*((Product.id == product_id, rank) for rank, product_id in enumerate(product_ids)))
+        )
+
+
+SEARCH_BACKENDS = {
+    'memory': InMemorySearchEngine,
+    'like': LikeSearchEngine,
+}
+
+
+def init_search(app):
+    """Create the configured search backend and keep it in sync with commits"""
+    backend = app.config.get('SEARCH_BACKEND', 'memory')
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(f'Unknown SEARCH_BACKEND: {backend}')
+
+    if backend == 'memory':
+        engine = InMemorySearchEngine(max_results=app.config.get('SEARCH_MAX_RESULTS', 1000))
+    else:
+        engine = SEARCH_BACKENDS[backend]()
+
+    app.extensions['search'] = engine
+    register_listener(app, engine.apply_changes)
+    return engine
+
+
+def get_search_engine():
+    return current_app.extensions['search']
@@ -0,0 +1,153 @@
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+
+from models import db, parse_json_text, Product, Salt, Review
+
+RELATIONS = ('salts', 'reviews')
+PRODUCT_FIELDS = Product.PUBLIC_FIELDS
+SUMMARY_FIELDS = tuple(field for field in PRODUCT_FIELDS if field not in Product.HEAVY_FIELDS)
+
+DEFAULT_REVIEWS_LIMIT = 20
+MAX_REVIEWS_LIMIT = 100
+
+
+class InvalidSelection(ValueError):
+    pass
+
+
+def parse_include(value, default=()):
+    """Parse an ``include=salts,reviews`` query argument"""
+    if value is None:
+        return set(default)
+    include = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = include - set(RELATIONS)
+    if unknown:
+        raise InvalidSelection(f"Unknown include: {', '.join(sorted(unknown))}")
+    return include
+
+
+def parse_fields(value, view=None):
+    """
+    Parse a ``fields=id,name,price`` query argument (``None`` = all fields).
+
+    Without explicit fields, ``view=summary`` selects every field except the
+    long description/usage text columns.
+    """
+    if not value:
+        if view in (None, 'full'):
+            return None
+        if view == 'summary':
+            return list(SUMMARY_FIELDS)
+        raise InvalidSelection(f'Unknown view: {view}')
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = set(fields) - set(PRODUCT_FIELDS)
+    if unknown:
+        raise InvalidSelection(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+
+def parse_reviews_limit(value):
+    if value is None:
+        return DEFAULT_REVIEWS_LIMIT
+    return max(0, min(value, MAX_REVIEWS_LIMIT))
+
+
+def load_fields(query, fields):
+    """Restrict the columns selected for ``Product`` rows to ``fields``"""
+    if fields is None:
+        return query
+    columns = {'id', 'created_at', *fields}
+    return query.options(load_only(*(getattr(Product, field) for field in columns)))
+
+
+def select_fields(query, fields):
+    """
+    Select ``fields`` of ``Product`` as plain row tuples instead of ORM objects.
+
+    ``id`` and ``created_at`` are always selected for batch loading and
+    cursors. Rows skip identity-map bookkeeping and attribute instrumentation,
+    which dominates serialization time on large listing pages.
+    """
+    columns = dict.fromkeys(['id', 'created_at', *(fields or PRODUCT_FIELDS)])
+    return query.with_entities(*(getattr(Product, column) for column in columns))
+
+
+def product_data(product, fields=None):
+    """Response dict for a ``Product`` or a row from ``select_fields``"""
+    if isinstance(product, Product):
+        return product.to_dict(fields=fields)
+    data = {}
+    for field in fields or PRODUCT_FIELDS:
+        value = getattr(product, field)
+        if field in Product.JSON_FIELDS:
+            value = parse_json_text(value) if value else []
+        data[field] = value  # datetimes are encoded by the JSON provider
+    return data
+
+
+def load_salts(product_ids):
+    """Fetch the salts of many products in one ``IN`` query"""
+    salts_by_product = {product_id: [] for product_id in product_ids}
+    if product_ids:
+        salts = Salt.query.filter(Salt.product_id.in_(product_ids)).order_by(Salt.created_at, Salt.id)
+        for salt in salts:
+            salts_by_product[salt.product_id].append(salt)
+    return salts_by_product
+
+
+def load_reviews(product_ids, limit):
+    """
+    Fetch the newest ``limit + 1`` reviews of many products in one query.
+
+    The extra row per product only tells the caller that more reviews exist.
+    """
+    reviews_by_product = {product_id: [] for product_id in product_ids}
+    if not product_ids or limit <= 0:
+        return reviews_by_product
+
+    newest_first = (Review.created_at.desc(), Review.id.desc())
+    if len(product_ids) == 1:
+        reviews = Review.query.filter_by(product_id=product_ids[0]).order_by(*newest_first).limit(limit + 1)
+    else:
+        position = func.row_number().over(
+            partition_by=Review.product_id, order_by=newest_first
+        ).label('position')
+        ranked = db.session.query(Review.id.label('id'), position).filter(
+            Review.product_id.in_(product_ids)
+        ).subquery()
+        reviews = Review.query.join(ranked, Review.id == ranked.c.id).filter(
+            ranked.c.position <= limit + 1
+        ).order_by(Review.product_id, *newest_first)
+
+    for review in reviews:
+        reviews_by_product[review.product_id].append(review)
+    return reviews_by_product
+
+
+def serialize_products(products, include=(), fields=None, reviews_limit=DEFAULT_REVIEWS_LIMIT):
+    """
+    Serialize products (ORM objects or ``select_fields`` rows) with their
+    requested relations loaded in batch.
+
+    Related salts and reviews are fetched with one query each for the whole
+    list rather than one lazy load per product. Embedded reviews are capped at
+    ``reviews_limit`` newest entries, with ``has_more_reviews`` telling clients
+    to page the rest through ``/api/reviews/``.
+    """
+    product_ids = [product.id for product in products]
+    salts_by_product = load_salts(product_ids) if 'salts' in include else None
+    reviews_by_product = load_reviews(product_ids, reviews_limit) if 'reviews' in include else None
+
+    results = []
+    for product in products:
+        data = product_data(product, fields)
+        if salts_by_product is not None:
+            data['salts'] = [salt.to_dict() for salt in salts_by_product[product.id]]
+        if reviews_by_product is not None:
+            reviews = reviews_by_product[product.id]
+            data['reviews'] = [review.to_dict() for review in reviews[:reviews_limit]]
+            data['has_more_reviews'] = len(reviews) > reviews_limit
+        results.append(data)
+    return results
@@ -0,0 +1,237 @@
+import marshal
+import mmap
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import DateTime, func, select
+
+from models import db, AppConfig, Product, Salt
+from services.changes import DELETION_RETENTION, ChangeSet, catalog_deletions, catalog_marker
+
+SNAPSHOT_MAGIC = b'MDGSNAP2'
+SNAPSHOT_FORMAT = 2
+
+# marshal data is only readable by the Python version and marshal format that wrote it
+SNAPSHOT_HEADER = SNAPSHOT_MAGIC + bytes([sys.version_info.major, sys.version_info.minor, marshal.version])
+
+# Columns kept per table: what the in-memory indexes and the config store are built from
+PRODUCT_COLUMNS = ('id', 'name', 'brand', 'generic_name', 'category', 'price', 'prescription_required')
+SALT_COLUMNS = ('id', 'product_id', 'salt_name', 'strength')
+CONFIG_COLUMNS = ('id', 'key', 'value', 'type', 'description', 'created_at', 'updated_at')
+
+# Rows written this long before the snapshot started are read again as deltas, covering clock skew
+DELTA_OVERLAP = timedelta(seconds=60)
+
+ProductRow = namedtuple('ProductRow', PRODUCT_COLUMNS)
+SaltRow = namedtuple('SaltRow', SALT_COLUMNS)
+
+
+class InvalidSnapshot(ValueError):
+    pass
+
+
+class Snapshot:
+    """Decoded warm-start snapshot: product and salt rows, config rows and when they were read"""
+
+    def __init__(self, payload):
+        self.built_at = datetime.fromisoformat(payload['built_at'])
+        self.products = [ProductRow(*row) for row in zip(*(payload['products'][c] for c in PRODUCT_COLUMNS))]
+        self.salts = [SaltRow(*row) for row in zip(*(payload['salts'][c] for c in SALT_COLUMNS))]
+        self.config = [
+            {column: _decode(AppConfig.__table__.c[column], value) for column, value in zip(CONFIG_COLUMNS, row)}
+            for row in zip(*(payload['config'][c] for c in CONFIG_COLUMNS))
+        ]
+        updated_at, count = payload['config_marker']
+        self.config_marker = (datetime.fromisoformat(updated_at) if updated_at else None, count)
+
+
+def _encode(column, value):
+    if value is not None and isinstance(column.type, DateTime):
+        return value.isoformat()
+    return value
+
+
+def _decode(column, value):
+    if value is not None and isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _read_table(connection, table, columns):
+    """``{column: [values]}`` for the whole table; columnar lists keep the marshalled file small"""
+    rows = connection.execute(select(*(table.c[column] for column in columns))).all()
+    return {
+        column: [_encode(table.c[column], row[index]) for row in rows]
+        for index, column in enumerate(columns)
+    }
+
+
+def build_snapshot(path):
+    """
+    Write the snapshot file atomically; returns the number of products, salts and config rows.
+
+    All tables are read in one transaction so they agree with each other.
+    """
+    built_at = datetime.utcnow()
+    with db.engine.begin() as connection:
+        payload = {
+            'format': SNAPSHOT_FORMAT,
+            'built_at': built_at.isoformat(),
+            'products': _read_table(connection, Product.__table__, PRODUCT_COLUMNS),
+            'salts': _read_table(connection, Salt.__table__, SALT_COLUMNS),
+            'config': _read_table(connection, AppConfig.__table__, CONFIG_COLUMNS),
+        }
+        updated_at, count = connection.execute(
+            select(func.max(AppConfig.updated_at), func.count(AppConfig.id))
+        ).one()
+        payload['config_marker'] = (updated_at.isoformat() if updated_at else None, count)
+
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(SNAPSHOT_HEADER)
+        f.write(marshal.dumps(payload))
+    os.replace(temporary, path)
+    return tuple(len(payload[table]['id']) for table in ('products', 'salts', 'config'))
+
+
+def load_snapshot(path):
+    """
+    Map the snapshot file and decode it.
+
+    The file is read through ``mmap``, so workers on one host share its pages
+    in the OS page cache; each still decodes its own Python objects.
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise InvalidSnapshot(f'{path} is not a snapshot file, or was written by an older version')
+            header = mapped[:len(SNAPSHOT_HEADER)]
+            if header != SNAPSHOT_HEADER:
+                major, minor, marshal_version = header[len(SNAPSHOT_MAGIC):].ljust(3, b'\0')
+                raise InvalidSnapshot(
+                    f'{path} was written by Python {major}.{minor} (marshal version {marshal_version}); '
+                    f'rebuild it with this interpreter'
+                )
+            with memoryview(mapped) as view:
+                try:
+                    payload = marshal.loads(view[len(SNAPSHOT_HEADER):])
+                except (EOFError, ValueError, TypeError) as e:
+                    raise InvalidSnapshot(f'{path} is corrupt: {e}')
+    if not isinstance(payload, dict) or payload.get('format') != SNAPSHOT_FORMAT:
+        raise InvalidSnapshot(f'{path} has an unsupported snapshot format')
+    return Snapshot(payload)
+
+
+def catch_up(snapshot):
+    """
+    Products and salts written since the snapshot as a ChangeSet, and the catalog marker it covers.
+
+    Inserts and updates are found by ``updated_at`` and deletes by their
+    tombstones. The marker is read first, so a write that lands while the
+    deltas are read moves it and the catalog watcher rebuilds later.
+    """
+    products, salts = Product.__table__, Salt.__table__
+    since = snapshot.built_at - DELTA_OVERLAP
+    changes = ChangeSet()
+    marker = catalog_marker()
+
+    for row in db.session.execute(
+        select(*(products.c[column] for column in PRODUCT_COLUMNS)).where(products.c.updated_at > since)
+    ):
+        changes.add(Product, row._asdict())
+    for row in db.session.execute(
+        select(*(salts.c[column] for column in SALT_COLUMNS)).where(salts.c.updated_at > since)
+    ):
+        changes.add(Salt, row._asdict())
+    for row in db.session.execute(
+        select(catalog_deletions.c.table_name, catalog_deletions.c.row_id).where(catalog_deletions.c.deleted_at > since)
+    ):
+        changes.add(Product if row.table_name == products.name else Salt, {'id': row.row_id}, deleted=True)
+    return changes, marker
+
+
+def warm_start(app):
+    """
+    Fill the search, facet and substitute indexes and the config store from WARM_START_SNAPSHOT.
+
+    Rows written and deleted after the snapshot are then read from the
+    database and applied. Returns False when no usable snapshot exists.
+    """
+    path = app.config.get('WARM_START_SNAPSHOT')
+    if not path:
+        return False
+    started = time.perf_counter()
+    try:
+        snapshot = load_snapshot(path)
+    except (OSError, InvalidSnapshot) as e:
+        app.logger.warning('Warm start skipped: %s', e)
+        return False
+    # Tombstones are purged after DELETION_RETENTION, so older snapshots could miss deletes
+    max_age = timedelta(seconds=app.config.get('WARM_START_MAX_AGE') or 0) or DELETION_RETENTION
+    if datetime.utcnow() - snapshot.built_at > min(max_age, DELETION_RETENTION):
+        app.logger.warning('Warm start skipped: %s was built at %s', path, snapshot.built_at.isoformat())
+        return False
+
+    app.extensions['search'].rebuild(snapshot.products, snapshot.salts)
+    app.extensions['facets'].rebuild(snapshot.products)
+    app.extensions['substitutes'].rebuild(snapshot.products, snapshot.salts)
+    app.extensions['config_store'].prime([AppConfig(**row) for row in snapshot.config], snapshot.config_marker)
+
+    changes, marker = catch_up(snapshot)
+    for name in ('search', 'facets', 'substitutes'):
+        app.extensions[name].apply_changes(changes)
+    app.extensions['catalog_watcher'].mark(marker)
+
+    app.logger.info(
+        'Warm start from %s: %d products, %d salts, %d changed since (%.0f ms)', path,
+        len(snapshot.products), len(snapshot.salts), len(changes.upserted(Product)) + len(changes.upserted(Salt)),
+        (time.perf_counter() - started) * 1000
+    )
+    return True
+
+
+@click.group('snapshot')
+def snapshot_cli():
+    """Warm-start snapshot of the catalog and config."""
+
+
+@snapshot_cli.command('build')
+@click.argument('path', required=False)
+@with_appcontext
+def build_command(path):
+    """Write the snapshot to PATH (default: WARM_START_SNAPSHOT)."""
+    path = path or current_app.config.get('WARM_START_SNAPSHOT')
+    if not path:
+        raise click.UsageError('Give a PATH or set WARM_START_SNAPSHOT')
+    started = time.perf_counter()
+    products, salts, configs = build_snapshot(path)
+    click.echo(
+        f'Wrote {path}: {products} products, {salts} salts, {configs} config entries, '
+        f'{os.path.getsize(path) / 1024:.0f} KiB in {time.perf_counter() - started:.1f}s'
+    )
+
+
+@snapshot_cli.command('info')
+@click.argument('path', required=False)
+@with_appcontext
+def info_command(path):
+    """Show when a snapshot was built and what it holds."""
+    path = path or current_app.config.get('WARM_START_SNAPSHOT')
+    if not path:
+        raise click.UsageError('Give a PATH or set WARM_START_SNAPSHOT')
+    try:
+        snapshot = load_snapshot(path)
+    except (OSError, InvalidSnapshot) as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Built at {snapshot.built_at.isoformat()} UTC')
+    click.echo(f'{len(snapshot.products)} products, {len(snapshot.salts)} salts, {len(snapshot.config)} config entries')
+
+
+def init_snapshot(app):
+    app.cli.add_command(snapshot_cli)
@@ -0,0 +1,163 @@
+import re
+import threading
+from bisect import bisect_left, insort
+
+from flask import current_app
+
+from models import db, Product, Salt
+from services.changes import register_listener
+
+_STRENGTH_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*([a-zµ%]*)(.*)$')
+
+# Mass units folded into milligrams so "0.5 g" and "500mg" compare equal
+_MG_FACTORS = {'mg': 1, 'g': 1000, 'mcg': 0.001, 'ug': 0.001, 'µg': 0.001}
+
+
+def normalize_salt_name(name):
+    return ' '.join((name or '').lower().split())
+
+
+def normalize_strength(strength):
+    text = ''.join((strength or '').lower().split())
+    match = _STRENGTH_RE.match(text)
+    if not match:
+        return text
+    amount, unit, rest = match.groups()
+    if unit in _MG_FACTORS:
+        return f'{float(amount) * _MG_FACTORS[unit]:g}mg{rest}'
+    return f'{float(amount):g}{unit}{rest}'
+
+
+def composition_signature(salts):
+    """Canonical key for a set of (salt_name, strength) pairs"""
+    parts = sorted({(normalize_salt_name(name), normalize_strength(strength)) for name, strength in salts})
+    return '|'.join(f'{name}:{strength}' for name, strength in parts)
+
+
+class SubstituteIndex:
+    """
+    Maps each salt composition to its products, cheapest first.
+
+    Built on first use and updated from committed Salt and Product changes,
+    so finding same-composition alternatives is a single dictionary lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._reset()
+
+    def _reset(self):
+        self._salts = {}  # salt_id -> (product_id, salt_name, strength)
+        self._product_salts = {}  # product_id -> set(salt_id)
+        self._prices = {}  # product_id -> price
+        self._placed = {}  # product_id -> (signature, price) as stored in _groups
+        self._groups = {}  # signature -> sorted [(price, product_id)]
+
+    def rebuild(self, products=None, salts=None):
+        """Build from the database, or from ``products``/``salts`` rows (a warm-start snapshot)"""
+        with self._lock:
+            self._reset()
+            if products is None:
+                products = db.session.query(Product.id, Product.price).yield_per(1000)
+            for row in products:
+                self._prices[row.id] = row.price
+            if salts is None:
+                salts = db.session.query(Salt.id, Salt.product_id, Salt.salt_name, Salt.strength).yield_per(1000)
+            for row in salts:
+                self._salts[row.id] = (row.product_id, row.salt_name, row.strength)
+                self._product_salts.setdefault(row.product_id, set()).add(row.id)
+            for product_id in self._product_salts:
+                self._place(product_id)
+            self._built = True
+
+    def invalidate(self):
+        """Rebuild on next use, after writes that bypassed the ORM session"""
+        with self._lock:
+            self._built = False
+            self._reset()
+
+    def apply_changes(self, changes):
+        if not changes.touches(Product, Salt):
+            return
+        with self._lock:
+            if not self._built:
+                return
+            touched = set()
+            for row in changes.deleted(Product):
+                self._unplace(row['id'])
+                self._prices.pop(row['id'], None)
+                for salt_id in self._product_salts.pop(row['id'], set()):
+                    self._salts.pop(salt_id, None)
+            for row in changes.upserted(Product):
+                self._prices[row['id']] = row['price']
+                touched.add(row['id'])
+            for row in changes.deleted(Salt):
+                old = self._salts.pop(row['id'], None)
+                if old:
+                    self._product_salts.get(old[0], set()).discard(row['id'])
+                    touched.add(old[0])
+            for row in changes.upserted(Salt):
+                old = self._salts.get(row['id'])
+                if old and old[0] != row['product_id']:
+                    self._product_salts.get(old[0], set()).discard(row['id'])
+                    touched.add(old[0])
+                self._salts[row['id']] = (row['product_id'], row['salt_name'], row['strength'])
+                self._product_salts.setdefault(row['product_id'], set()).add(row['id'])
+                touched.add(row['product_id'])
+            for product_id in touched:
+                self._unplace(product_id)
+                self._place(product_id)
+
+    def _place(self, product_id):
+        salt_ids = self._product_salts.get(product_id)
+        if not salt_ids or product_id not in self._prices:
+            return
+        signature = composition_signature(self._salts[salt_id][1:] for salt_id in salt_ids)
+        price = self._prices[product_id]
+        self._placed[product_id] = (signature, price)
+        insort(self._groups.setdefault(signature, []), (price, product_id))
+
+    def _unplace(self, product_id):
+        placed = self._placed.pop(product_id, None)
+        if placed is None:
+            return
+        signature, price = placed
+        group = self._groups[signature]
+        del group[bisect_left(group, (price, product_id))]
+        if not group:
+            del self._groups[signature]
+
+    def composition(self, product_id):
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+            return sorted(
+                (self._salts[salt_id][1], self._salts[salt_id][2])
+                for salt_id in self._product_salts.get(product_id, ())
+            )
+
+    def substitutes(self, product_id, cheaper_only=False):
+        """IDs of other products with the same composition, cheapest first"""
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+            placed = self._placed.get(product_id)
+            if placed is None:
+                return []
+            signature, price = placed
+            return [
+                other_id for other_price, other_id in self._groups[signature]
+                if other_id != product_id and (not cheaper_only or other_price < price)
+            ]
+
+
+def init_substitutes(app):
+    index = SubstituteIndex()
+    app.extensions['substitutes'] = index
+    register_listener(app, index.apply_changes)
+    return index
+
+
+def get_substitute_index():
+    return current_app.extensions['substitutes']
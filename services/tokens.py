@@ -0,0 +1,194 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token, get_jwt, jwt_required
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, RevokedToken
+
+# expires_at stored for tokens issued without an ``exp`` claim
+NEVER_EXPIRES = datetime(9999, 12, 31)
+
+
+class TokenReused(Exception):
+    """A refresh token was presented again after it had been rotated"""
+
+
+class VerifiedTokenCache:
+    """
+    Claims of recently verified tokens, keyed by the SHA-256 of the encoded token.
+
+    Entries are dropped at the token's ``exp``, so a hit never outlives the
+    signature check it stands in for. Bounded by entry count, least recently
+    used first out.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(encoded_token):
+        return hashlib.sha256(encoded_token.encode()).digest()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, claims = item
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, key, claims):
+        if 'exp' not in claims:
+            return  # non-expiring tokens are always verified in full
+        with self._lock:
+            self._entries[key] = (claims['exp'], claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that skips signature and claim checks for tokens it verified before.
+
+    Only the plain header/query-string path is cached; CSRF-protected cookie
+    tokens and ``allow_expired`` decodes always go through PyJWT. Revocation is
+    checked after decoding on every request, cached or not.
+    """
+
+    def __init__(self, app=None, cache_size=4096):
+        self.verified = VerifiedTokenCache(cache_size)
+        super().__init__(app)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if csrf_value is not None or allow_expired or not self.verified.max_entries:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        key = self.verified.key(encoded_token)
+        claims = self.verified.get(key)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token)
+            self.verified.set(key, claims)
+        return dict(claims)
+
+
+class RevocationList:
+    """
+    Unexpired revoked token IDs, held as an in-memory set.
+
+    Revocations made by this process are added immediately. Those made by
+    other workers are picked up by a periodic ``max(revoked_at)``/count check,
+    so they take effect here within ``check_interval`` seconds.
+    """
+
+    def __init__(self, check_interval=10):
+        self.check_interval = check_interval
+        self._revoked = None
+        self._marker = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _current_marker(self):
+        return tuple(db.session.query(func.max(RevokedToken.revoked_at), func.count(RevokedToken.jti)).one())
+
+    def reload(self):
+        with self._lock:
+            self._marker = self._current_marker()
+            self._revoked = set(db.session.execute(
+                select(RevokedToken.jti).where(RevokedToken.expires_at > datetime.utcnow())
+            ).scalars())
+            self._checked_at = time.monotonic()
+            return self._revoked
+
+    def add(self, jti):
+        revoked = self._revoked
+        if revoked is not None:
+            revoked.add(jti)
+
+    def is_revoked(self, jti):
+        revoked = self._revoked
+        if revoked is None:
+            revoked = self.reload()
+        elif self.check_interval and time.monotonic() - self._checked_at >= self.check_interval:
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._checked_at = time.monotonic()
+                    stale = self._current_marker() != self._marker
+                finally:
+                    self._lock.release()
+                if stale:
+                    revoked = self.reload()
+        return jti in revoked
+
+
+def issue_tokens(user_id):
+    """A new access/refresh token pair for ``user_id``; users listed in ADMIN_USER_IDS get an ``admin`` claim"""
+    claims = {'admin': True} if user_id in current_app.config.get('ADMIN_USER_IDS', ()) else None
+    return {
+        'token': create_access_token(identity=user_id, additional_claims=claims),
+        'refresh_token': create_refresh_token(identity=user_id)
+    }
+
+
+def admin_required(view):
+    """Like ``jwt_required()``, but the access token must also carry the ``admin`` claim (403 otherwise)"""
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if not get_jwt().get('admin'):
+            return jsonify({'error': 'Admin privileges required'}), 403
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def revoke_token(claims):
+    """
+    Record ``claims['jti']`` as revoked until the token expires.
+
+    Expired rows are purged in the same transaction. Raises TokenReused when
+    the token was already revoked, which for a refresh token means it was
+    rotated before (possibly by someone else holding a copy).
+    """
+    expires_at = datetime.utcfromtimestamp(claims['exp']) if 'exp' in claims else NEVER_EXPIRES
+    db.session.query(RevokedToken).filter(RevokedToken.expires_at <= datetime.utcnow()).delete(
+        synchronize_session=False
+    )
+    db.session.add(RevokedToken(
+        jti=claims['jti'], token_type=claims['type'], user_id=claims['sub'], expires_at=expires_at
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise TokenReused('Token has already been used')
+    current_app.extensions['token_revocations'].add(claims['jti'])
+
+
+def init_tokens(app):
+    """JWT manager with the verified-token cache and the revocation list wired in"""
+    jwt = CachingJWTManager(app, cache_size=app.config.get('JWT_VERIFIED_CACHE_SIZE', 4096))
+    revocations = RevocationList(check_interval=app.config.get('TOKEN_REVOCATION_REFRESH_INTERVAL', 10))
+    app.extensions['token_revocations'] = revocations
+
+    @jwt.token_in_blocklist_loader
+    def token_revoked(jwt_header, jwt_payload):
+        return revocations.is_revoked(jwt_payload['jti'])
+
+    return jwt
@@ -0,0 +1,48 @@
+import pytest
+
+from app import create_app
+from config import TestingConfig
+from models import db, Product, Review, Salt
+
+
+@pytest.fixture
+def id_storage():
+    return 'string'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, id_storage):
+    """App on a fresh SQLite file, with rate limits off"""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(TestingConfig, 'ID_STORAGE', id_storage)
+    monkeypatch.setattr(TestingConfig, 'RATE_LIMIT_BACKEND', 'none')
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    app.extensions['password_hasher'].shutdown()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_product(app):
+    def make_product(name='Paracip 500', brand='Cipla', price=10.0, salts=(), reviews=(), **fields):
+        product = Product(
+            name=name, brand=brand, price=price, generic_name=fields.pop('generic_name', 'Paracetamol'),
+            category=fields.pop('category', 'Fever'), **fields
+        )
+        db.session.add(product)
+        db.session.flush()
+        for salt_name, strength in salts:
+            db.session.add(Salt(product_id=product.id, salt_name=salt_name, strength=strength))
+        for rating in reviews:
+            db.session.add(Review(product_id=product.id, user_name='reviewer', rating=rating))
+        db.session.commit()
+        return product
+
+    return make_product
@@ -0,0 +1,43 @@
+from models import db
+
+
+def names(response):
+    return [product['name'] for product in response.get_json()['products']]
+
+
+def test_listing_is_served_from_cache_until_a_commit(client, make_product):
+    product = make_product(name='Paracip 500')
+    first = client.get('/api/products/')
+
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE products SET name = 'Renamed outside the session'")
+    assert names(client.get('/api/products/')) == ['Paracip 500']
+
+    product.price = 12.0
+    db.session.commit()
+    second = client.get('/api/products/')
+
+    assert names(second) == ['Renamed outside the session']
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+def test_matching_etag_gets_304(client, make_product):
+    make_product()
+    etag = client.get('/api/products/').headers['ETag']
+
+    response = client.get('/api/products/', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.get_data() == b''
+
+
+def test_external_change_bumps_generations(app, client, make_product):
+    make_product(name='Paracip 500')
+    client.get('/api/products/')
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE products SET name = 'Renamed', updated_at = '2100-01-01 00:00:00'")
+
+    watcher = app.extensions['catalog_watcher']
+    watcher._checked_at -= watcher.check_interval
+
+    assert names(client.get('/api/products/')) == ['Renamed']
@@ -0,0 +1,50 @@
+from models import db, Product, Salt
+from services.changes import catalog_marker
+from services.search import get_search_engine
+from services.snapshot import build_snapshot, warm_start
+
+
+def test_marker_moves_on_salt_edit_and_delete(make_product):
+    product = make_product(salts=[('Paracetamol', '500 mg')])
+    before = catalog_marker()
+
+    Salt.query.one().strength = '650 mg'
+    db.session.commit()
+    after_edit = catalog_marker()
+    assert after_edit[1] > before[1]
+
+    db.session.delete(db.session.get(Product, product.id))
+    db.session.commit()
+    assert catalog_marker()[2] is not None and catalog_marker() != after_edit
+
+
+def test_watcher_rebuilds_after_write_from_another_process(app, client, make_product):
+    make_product(name='Crocin')
+    watcher = app.extensions['catalog_watcher']
+    assert client.get('/api/products/?search=dolo').get_json()['total'] == 0
+
+    with db.engine.begin() as connection:  # bypasses the session, like a CLI import
+        connection.execute(Product.__table__.insert().values(
+            id='0190d2a8-0000-7000-8000-000000000001', name='Dolo 650', brand='Micro', price=30.0
+        ))
+    watcher._checked_at -= watcher.check_interval
+
+    assert client.get('/api/products/?search=dolo').get_json()['total'] == 1
+
+
+def test_warm_start_applies_updates_and_deletes(app, tmp_path, make_product):
+    kept = make_product(name='Crocin')
+    dropped = make_product(name='Dolo 650')
+    path = tmp_path / 'catalog.snapshot'
+    build_snapshot(str(path))
+
+    db.session.delete(db.session.get(Product, dropped.id))
+    db.session.get(Product, kept.id).name = 'Crocin Advance'
+    db.session.commit()
+    get_search_engine().invalidate()
+
+    app.config['WARM_START_SNAPSHOT'] = str(path)
+    assert warm_start(app)
+    engine = get_search_engine()
+    assert engine.search('advance') == [kept.id]
+    assert engine.search('dolo') == []
@@ -0,0 +1,24 @@
+from services.tokens import issue_tokens
+
+
+def auth(user_id):
+    return {'Authorization': f"Bearer {issue_tokens(user_id)['token']}"}
+
+
+def test_reload_requires_a_token(client):
+    assert client.post('/api/config/reload').status_code == 401
+
+
+def test_reload_rejects_non_admin_tokens(client):
+    response = client.post('/api/config/reload', headers=auth('someone'))
+
+    assert response.status_code == 403
+
+
+def test_reload_with_admin_token(app, client):
+    app.config['ADMIN_USER_IDS'] = frozenset({'admin'})
+
+    response = client.post('/api/config/reload', headers=auth('admin'))
+
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
@@ -0,0 +1,43 @@
+import json
+from datetime import datetime, timedelta
+
+from models import db, Product, Salt
+from services.export import EXPORT_OVERLAP
+
+
+def export_ids(client, **params):
+    response = client.get('/api/products/export', query_string=params)
+    assert response.status_code == 200
+    return response, [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()]
+
+
+def age(model, row_id, days):
+    stamp = datetime.utcnow() - timedelta(days=days)
+    db.session.execute(model.__table__.update().where(model.__table__.c.id == row_id).values(updated_at=stamp))
+    db.session.commit()
+
+
+def test_next_cursor_overlaps_the_export(client):
+    before = datetime.utcnow()
+    response, _ = export_ids(client)
+
+    started_at = datetime.fromisoformat(response.headers['X-Export-Started-At'])
+    assert before - EXPORT_OVERLAP <= started_at <= datetime.utcnow() - EXPORT_OVERLAP
+
+
+def test_incremental_export_includes_salt_edits(client, make_product):
+    unchanged = make_product(name='Old', salts=[('Paracetamol', '500 mg')])
+    edited_salt = make_product(name='Salted', salts=[('Ibuprofen', '200 mg')])
+    changed = make_product(name='New')
+    for product in (unchanged, edited_salt):
+        age(Product, product.id, 2)
+        for salt in Salt.query.filter_by(product_id=product.id):
+            age(Salt, salt.id, 2)
+    since = (datetime.utcnow() - timedelta(days=1)).isoformat()
+
+    salt = Salt.query.filter_by(product_id=edited_salt.id).one()
+    salt.strength = '400 mg'
+    db.session.commit()
+
+    _, ids = export_ids(client, updated_since=since)
+    assert sorted(ids) == sorted([edited_salt.id, changed.id])
@@ -0,0 +1,56 @@
+from models import db, Product, Review, Salt
+from services.importer import import_rows
+
+
+def rows(*items):
+    return list(enumerate(items, start=1))
+
+
+def product_row(**fields):
+    return dict({'name': 'Paracip 500', 'brand': 'Cipla', 'price': '10', 'generic_name': 'Paracetamol'}, **fields)
+
+
+def test_products_are_upserted_by_brand_and_name(app, make_product):
+    existing = make_product(price=5.0)
+
+    report = import_rows('products', rows(product_row(brand=' CIPLA ', price='12'), product_row(name='Dolo 650')))
+
+    assert (report.inserted, report.updated, report.invalid) == (1, 1, 0)
+    assert Product.query.count() == 2
+    assert db.session.get(Product, existing.id, populate_existing=True).price == 12.0
+
+
+def test_duplicate_product_rows_keep_every_salt(app):
+    report = import_rows('products', rows(
+        product_row(price='10', salts=[{'salt_name': 'Paracetamol', 'strength': '500 mg'}]),
+        product_row(price='11', salts=[{'salt_name': 'Caffeine', 'strength': '30 mg'}]),
+        product_row(price='12', salts=[{'salt_name': 'paracetamol', 'strength': '650 mg'}]),
+    ))
+
+    product = Product.query.one()
+    assert report.inserted == 1
+    assert product.price == 12.0
+    assert {(salt.salt_name.lower(), salt.strength) for salt in Salt.query.filter_by(product_id=product.id)} == {
+        ('paracetamol', '650 mg'), ('caffeine', '30 mg')
+    }
+
+
+def test_invalid_rows_are_reported(app):
+    report = import_rows('products', rows(product_row(price='-1'), product_row(name=''), product_row()))
+
+    assert (report.inserted, report.invalid) == (1, 2)
+    assert [line for line, _ in report.errors] == [1, 2]
+
+
+def test_reviews_resolve_products_and_rebuild_ratings(app, make_product):
+    product = make_product()
+
+    report = import_rows('reviews', rows(
+        {'product_brand': 'cipla', 'product_name': 'Paracip 500', 'user_name': 'a', 'rating': '4'},
+        {'product_id': product.id, 'user_name': 'b', 'rating': '2'},
+        {'product_brand': 'cipla', 'product_name': 'Unknown', 'user_name': 'c', 'rating': '5'},
+    ))
+
+    assert (report.inserted, report.invalid) == (2, 1)
+    assert Review.query.count() == 2
+    assert db.session.get(Product, product.id, populate_existing=True).avg_rating == 3.0
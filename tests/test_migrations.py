@@ -0,0 +1,26 @@
+from sqlalchemy import inspect
+
+from models import db, Product, ProductRatingSummary, RevokedToken
+from services.migrations import MIGRATIONS, schema_migrations, upgrade
+
+
+def test_upgrade_is_a_no_op_on_a_create_all_schema(app):
+    assert [version for version, _ in upgrade(db.engine)] == [version for version, _, _ in MIGRATIONS]
+    assert upgrade(db.engine) == []
+
+
+def test_upgrade_creates_tables_missing_from_older_databases(app, make_product):
+    product = make_product(reviews=(5, 3))
+    with db.engine.begin() as connection:
+        ProductRatingSummary.__table__.drop(connection)
+        RevokedToken.__table__.drop(connection)
+        connection.execute(db.text("UPDATE products SET avg_rating = 0"))
+    db.session.expire_all()
+
+    upgrade(db.engine)
+
+    tables = inspect(db.engine).get_table_names()
+    assert {'product_rating_summaries', 'revoked_tokens', schema_migrations.name} <= set(tables)
+    summary = db.session.get(ProductRatingSummary, product.id)
+    assert (summary.rating_count, summary.rating_sum, summary.rating_5) == (2, 8, 1)
+    assert db.session.get(Product, product.id).avg_rating == 4.0
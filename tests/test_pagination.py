@@ -0,0 +1,48 @@
+import pytest
+
+from services.pagination import MAX_PER_PAGE, InvalidPageSize, parse_per_page
+
+
+def test_per_page_is_clamped():
+    assert parse_per_page(None, 20) == 20
+    assert parse_per_page('0', 20) == 1
+    assert parse_per_page('-5', 20) == 1
+    assert parse_per_page('5000', 20) == MAX_PER_PAGE
+    with pytest.raises(InvalidPageSize):
+        parse_per_page('ten', 20)
+
+
+@pytest.mark.parametrize('path', ['/api/products/', '/api/reviews/', '/api/salts/'])
+def test_listings_clamp_per_page(client, make_product, path):
+    make_product(salts=[('Paracetamol', '500 mg')], reviews=(4,))
+
+    assert client.get(f'{path}?per_page=0&cursor=').status_code == 200
+    assert client.get(f'{path}?per_page=5000').get_json()['per_page'] == MAX_PER_PAGE
+    assert client.get(f'{path}?per_page=ten').status_code == 400
+
+
+def walk(client, url):
+    seen, cursor = [], ''
+    while cursor is not None:
+        page = client.get(f'{url}&cursor={cursor}').get_json()
+        seen += [product['id'] for product in page['products']]
+        cursor = page['next_cursor']
+    return seen
+
+
+@pytest.mark.parametrize('id_storage', ['string', 'binary'])
+@pytest.mark.parametrize('sort', ['', 'price', '-price', 'name'])
+def test_keyset_pages_cover_the_listing_once(client, make_product, sort, id_storage):
+    for i in range(7):
+        make_product(name=f'Product {i % 3}', price=float(i % 2))
+
+    ids = walk(client, f'/api/products/?per_page=2&sort={sort}')
+    offset = client.get(f'/api/products/?per_page=100&sort={sort}').get_json()['products']
+
+    assert len(ids) == len(set(ids)) == 7
+    if sort:
+        assert ids == [product['id'] for product in offset]
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get('/api/products/?cursor=not-a-cursor').status_code == 400
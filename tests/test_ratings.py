@@ -0,0 +1,56 @@
+from models import db, Product, ProductRatingSummary, Review
+
+
+def summary(product_id):
+    db.session.expire_all()
+    return db.session.get(ProductRatingSummary, product_id)
+
+
+def test_insert_and_delete_update_summary(make_product):
+    product = make_product(reviews=(5, 3))
+    assert (summary(product.id).rating_count, summary(product.id).rating_sum) == (2, 8)
+
+    db.session.delete(Review.query.filter_by(rating=5).one())
+    db.session.commit()
+    row = summary(product.id)
+    assert (row.rating_count, row.rating_sum, row.rating_5, row.rating_3) == (1, 3, 0, 1)
+
+
+def test_rating_change_on_expired_review(make_product):
+    product = make_product(reviews=(5,))
+    review = Review.query.one()
+    db.session.commit()  # expires the instance, so the old rating is not loaded
+
+    review.rating = 1
+    db.session.commit()
+
+    row = summary(product.id)
+    assert (row.rating_5, row.rating_1, row.rating_sum) == (0, 1, 1)
+    assert db.session.get(Product, product.id).avg_rating == 1.0
+
+
+def test_rating_change_on_loaded_review(make_product):
+    product = make_product(reviews=(5,))
+    review = Review.query.one()
+    assert review.rating == 5
+
+    review.rating = 1
+    db.session.commit()
+    review.rating = 2
+    db.session.commit()
+
+    row = summary(product.id)
+    assert (row.rating_5, row.rating_1, row.rating_2, row.rating_count) == (0, 0, 1, 1)
+
+
+def test_moving_review_to_another_product(make_product):
+    first = make_product(name='First', reviews=(4,))
+    second = make_product(name='Second')
+    review = Review.query.one()
+    db.session.commit()
+
+    review.product_id = second.id
+    db.session.commit()
+
+    assert summary(first.id).rating_count == 0
+    assert (summary(second.id).rating_count, summary(second.id).rating_4) == (1, 1)
@@ -0,0 +1,50 @@
+import pytest
+
+from services.search import get_search_engine
+
+
+@pytest.mark.parametrize('id_storage', ['string', 'binary'])
+def test_listing_keeps_relevance_order(client, make_product, id_storage):
+    make_product(name='Other', generic_name='Dolozin')
+    make_product(name='Zeta tablet', generic_name='Dolozin extra')
+    make_product(name='Dolozin', generic_name='Other')
+    make_product(name='Alpha', brand='Dolozinco', generic_name='Other')
+
+    expected = get_search_engine().search('dolozin')
+    response = client.get('/api/products/?search=dolozin&per_page=10')
+
+    assert response.status_code == 200
+    assert [product['id'] for product in response.get_json()['products']] == expected
+
+
+def test_search_matches_prefixes_and_typos(make_product):
+    product = make_product(name='Crocin Advance', salts=[('Paracetamol', '500 mg')])
+    engine = get_search_engine()
+
+    assert engine.search('croc') == [product.id]
+    assert engine.search('paracetmol') == [product.id]
+    assert engine.search('ibuprofen') == []
+
+
+def test_filters_apply_before_truncation(app, client, make_product):
+    for i in range(5):
+        make_product(name=f'Dolo {i}', brand='Sun Pharma')
+    wanted = make_product(name='Dolo 99', brand='Cipla')
+    get_search_engine().max_results = 3
+
+    response = client.get('/api/products/?search=dolo&brand=Cipla').get_json()
+
+    assert response['total'] == 1
+    assert response['products'][0]['id'] == wanted.id
+
+
+def test_excluded_product_does_not_take_a_ranking_slot(app, client, make_product):
+    excluded = make_product(name='Dolo')
+    others = [make_product(name=f'Dolo {i}') for i in range(4)]
+    get_search_engine().max_results = 3
+
+    response = client.get(f'/api/products/?search=dolo&exclude_id={excluded.id}').get_json()
+
+    ids = [product['id'] for product in response['products']]
+    assert len(ids) == 3
+    assert excluded.id not in ids and set(ids) <= {product.id for product in others}
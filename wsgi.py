@@ -0,0 +1,4 @@
+"""WSGI entry point for production servers, e.g. ``gunicorn wsgi:app``. FLASK_CONFIG picks the configuration."""
+from app import create_app
+
+app = create_app()